@@ -0,0 +1,156 @@
+"""
+In-process response cache for upstream price data
+
+Travelpayouts serves cached fares that change at most hourly, so the raw
+upstream response bodies are kept in a TTL + LRU cache keyed by the
+normalized request parameters. The cache is bounded by both entry count
+and total body size; the least recently used entries are evicted first.
+
+Bodies are stored as bytes and decoded on every hit, so callers can
+freely enrich the returned JSON without touching the cached copy.
+
+Entries can outlive their TTL so that slow-changing data (calendar,
+popular destinations) can be served stale while it is refreshed in the
+background, or when the upstream is failing.
+"""
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+from .config import get_settings
+
+settings = get_settings()
+
+# Parameters that carry IATA/currency codes and are matched case-insensitively
+_UPPERCASE_PARAMS = {"origin", "destination", "currency"}
+
+# Parameters that never take part in the cache key
+_IGNORED_PARAMS = {"token"}
+
+
+def make_key(url: str, params: Optional[Dict[str, Any]] = None) -> Tuple:
+    """
+    Build a cache key from an upstream URL and its query parameters.
+
+    IATA and currency codes are upper-cased, booleans are normalized to
+    "true"/"false" and the API token is left out, so equivalent requests
+    share one entry.
+    """
+    normalized = []
+    for name, value in (params or {}).items():
+        if name in _IGNORED_PARAMS or value is None:
+            continue
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        value = str(value).strip()
+        if name in _UPPERCASE_PARAMS:
+            value = value.upper()
+        elif value.lower() in ("true", "false"):
+            value = value.lower()
+        normalized.append((name, value))
+    return (url, tuple(sorted(normalized)))
+
+
+class TTLCache:
+    """
+    LRU cache of byte strings with a per-entry TTL.
+
+    An entry is fresh for ttl seconds. With stale_ttl > 0 it is kept for
+    that much longer so callers can still serve it stale (see lookup).
+    Bounded by max_entries and by max_bytes (sum of stored body sizes).
+    Not thread-safe: it is only used from the event loop.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (fresh_until, keep_until, body)
+        self._entries: "OrderedDict[Tuple, Tuple[float, float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key: Tuple) -> Optional[Tuple[bytes, float]]:
+        """
+        Return (body, overdue) for a retained entry, or None.
+
+        overdue is the number of seconds since the entry stopped being
+        fresh; zero or negative means it is still fresh.
+        """
+        entry = self._find(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        overdue = time.monotonic() - entry[0]
+        if overdue > 0:
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        return entry[2], overdue
+
+    def set(self, key: Tuple, value: bytes, ttl: float, stale_ttl: float = 0) -> None:
+        """
+        Store a body fresh for ttl seconds and kept stale_ttl longer.
+
+        ttl may be negative for an entry that is already stale (e.g. loaded
+        from the fare store) as long as it is still within stale_ttl.
+        """
+        if ttl + max(stale_ttl, 0) <= 0 or len(value) > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        fresh_until = time.monotonic() + ttl
+        self._entries[key] = (fresh_until, fresh_until + max(stale_ttl, 0), value)
+        self._bytes += len(value)
+
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _find(self, key: Tuple) -> Optional[Tuple[float, float, bytes]]:
+        """Return a retained entry and mark it recently used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: Tuple) -> None:
+        _, _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+
+# Shared cache for upstream responses (one per worker)
+response_cache = TTLCache(
+    max_entries=settings.CACHE_MAX_ENTRIES,
+    max_bytes=settings.CACHE_MAX_BYTES,
+)
@@ -15,6 +15,20 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./tripcompare.db"
 
+    # Connection pool (per engine, per worker)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # Non-SQLite backends only
+
+    # SQLite pragmas applied on every connection
+    DB_SQLITE_JOURNAL_MODE: str = "WAL"  # Readers do not block on writers
+    DB_SQLITE_SYNCHRONOUS: str = "NORMAL"
+    DB_SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    DB_SQLITE_CACHE_SIZE_KB: int = 65536
+    DB_SQLITE_MMAP_SIZE: int = 268435456  # 256 MB
+    DB_SQLITE_TEMP_STORE: str = "MEMORY"
+
     # API Keys (set these in environment variables)
     TRAVELPAYOUTS_TOKEN: str = ""
     TRAVELPAYOUTS_MARKER: str = ""
@@ -32,6 +46,89 @@ class Settings(BaseSettings):
     # Rate limiting
     RATE_LIMIT_PER_MINUTE: int = 60
 
+    # Upstream HTTP client (shared connection pool per worker)
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0
+    UPSTREAM_CONNECT_TIMEOUT: float = 5.0
+    UPSTREAM_TIMEOUT: float = 30.0
+    UPSTREAM_HTTP2: bool = False  # Requires the h2 package (httpx[http2])
+
+    # Upstream response cache (seconds per endpoint, 0 disables)
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # 32MB
+    CACHE_TTL_PRICES: int = 900  # prices/cheap, prices/direct
+    CACHE_TTL_CALENDAR: int = 1800  # prices/calendar
+    CACHE_TTL_POPULAR: int = 3600  # city-directions
+    CACHE_TTL_LATEST: int = 600  # aviasales/v3/prices_for_dates
+    CACHE_TTL_HOTELS: int = 1800  # hotellook cache.json
+
+    # On-disk fare store shared by all workers ("" disables)
+    FARE_STORE_PATH: str = "./fare_cache.db"
+
+    # Serve stale calendar/popular data while refreshing in the background
+    CACHE_SWR_CALENDAR: int = 600
+    CACHE_SWR_POPULAR: int = 1800
+    CACHE_STALE_IF_ERROR: int = 86400  # Fallback window when the upstream fails
+
+    # Circuit breaker per upstream host
+    BREAKER_FAILURE_RATE: float = 0.5  # Open when this share of recent calls fail
+    BREAKER_WINDOW: int = 20  # Number of recent calls considered
+    BREAKER_MIN_CALLS: int = 10
+    BREAKER_SLOW_CALL_SECONDS: float = 10.0  # Slower calls count as failures
+    BREAKER_OPEN_SECONDS: float = 30.0
+
+    # Hedged requests: duplicate a GET that is slower than the host's p95
+    UPSTREAM_HEDGE_ENABLED: bool = False
+    UPSTREAM_HEDGE_MIN_DELAY: float = 0.5
+
+    # Outbound rate limits per Travelpayouts API family (requests/second, 0 = off)
+    OUTBOUND_RATE_V1_PER_SECOND: float = 10.0
+    OUTBOUND_RATE_V3_PER_SECOND: float = 5.0
+    OUTBOUND_RATE_HOTELLOOK_PER_SECOND: float = 5.0
+    OUTBOUND_RATE_BURST: float = 10.0
+    OUTBOUND_RATE_MAX_QUEUE: int = 200
+    OUTBOUND_RATE_MAX_WAIT_SECONDS: float = 5.0
+
+    # Request deadlines (seconds); clients may shorten via X-Request-Timeout
+    REQUEST_DEADLINE_SECONDS: float = 25.0
+    REQUEST_DEADLINE_MAX_SECONDS: float = 60.0
+    DEADLINE_SEARCH_SECONDS: float = 15.0
+    DEADLINE_AUTOCOMPLETE_SECONDS: float = 5.0
+
+    # Multi-route search fan-out
+    SEARCH_BATCH_CONCURRENCY: int = 8
+
+    # Write-behind ingestion of analytics rows (search logs)
+    INGEST_BATCH_SIZE: int = 200  # Flush when this many records are queued
+    INGEST_FLUSH_INTERVAL_MS: int = 250  # ...or this long after the first one
+    INGEST_MAX_QUEUE: int = 10000
+    INGEST_OVERFLOW_POLICY: str = "drop"  # "drop" or "block" when the queue is full
+
+    # In-memory deal id -> affiliate link map for redirects (0 = never reload)
+    LINK_RESOLVER_REFRESH_SECONDS: float = 60.0
+    LINK_RESOLVER_MISS_TTL_SECONDS: float = 10.0  # Cache "no such deal" (0 = off)
+
+    # Log records waiting for the background writer; more are dropped
+    LOG_QUEUE_SIZE: int = 10000
+
+    # Prometheus /metrics. With several workers, set METRICS_DIR to a
+    # directory they share (cleared on deploy) to report totals for all
+    METRICS_DIR: str = ""
+    METRICS_FLUSH_SECONDS: float = 1.0
+
+    # Server-Timing response header, and the slow-request log threshold
+    SERVER_TIMING_ENABLED: bool = True
+    SLOW_REQUEST_MS: float = 1000.0
+
+    # Admin endpoints (/admin/*) need this in X-Admin-Token; unset = DEBUG only
+    ADMIN_TOKEN: str = ""
+
+    # Per-statement SQL statistics and slow-query plans (/admin/queries)
+    QUERY_STATS_ENABLED: bool = False
+    QUERY_SLOW_MS: float = 100.0
+    QUERY_STATS_MAX_STATEMENTS: int = 500
+
     class Config:
         env_file = ".env"
 
@@ -2,10 +2,15 @@
 CRUD operations for database models
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, desc, insert, update
+from collections import Counter
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timedelta
 from . import models, schemas
+from .link_resolver import deal_links
+from .pagination import after_row, require_anchor
+from . import rollups, search_index
 
 
 # ============== Subscriber CRUD ==============
@@ -15,9 +20,13 @@ def create_subscriber(db: Session, subscriber: schemas.SubscriberCreate) -> mode
         email=subscriber.email,
         name=subscriber.name,
         source=subscriber.source,
-        preferences=subscriber.preferences
+        preferences=subscriber.preferences,
+        created_at=datetime.utcnow()
     )
     db.add(db_subscriber)
+    _increment_rollups(db, rollups.SIGNUPS, [
+        {"source": db_subscriber.source, "created_at": db_subscriber.created_at}
+    ])
     db.commit()
     db.refresh(db_subscriber)
     return db_subscriber
@@ -27,11 +36,19 @@ def get_subscriber_by_email(db: Session, email: str) -> Optional[models.Subscrib
     return db.query(models.Subscriber).filter(models.Subscriber.email == email).first()
 
 
-def get_subscribers(db: Session, skip: int = 0, limit: int = 100, active_only: bool = True) -> List[models.Subscriber]:
+def get_subscribers(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        active_only: bool = True,
+        after_id: Optional[int] = None
+) -> List[models.Subscriber]:
     query = db.query(models.Subscriber)
     if active_only:
         query = query.filter(models.Subscriber.is_active == True)
-    return query.offset(skip).limit(limit).all()
+    if after_id is not None:
+        query = query.filter(after_row(models.Subscriber, models.Subscriber.id, after_id, descending=False))
+    return query.order_by(models.Subscriber.id).offset(skip).limit(limit).all()
 
 
 def update_subscriber(db: Session, email: str, subscriber: schemas.SubscriberUpdate) -> Optional[models.Subscriber]:
@@ -75,14 +92,25 @@ def get_destination(db: Session, destination_id: int) -> Optional[models.Destina
     return db.query(models.Destination).filter(models.Destination.id == destination_id).first()
 
 
-def get_destinations(db: Session, skip: int = 0, limit: int = 100, featured_only: bool = False) -> List[models.Destination]:
+def get_destinations(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        featured_only: bool = False,
+        after_id: Optional[int] = None
+) -> List[models.Destination]:
     query = db.query(models.Destination)
     if featured_only:
         query = query.filter(models.Destination.is_featured == True)
-    return query.offset(skip).limit(limit).all()
+    if after_id is not None:
+        query = query.filter(after_row(models.Destination, models.Destination.id, after_id, descending=False))
+    return query.order_by(models.Destination.id).offset(skip).limit(limit).all()
 
 
 def search_destinations(db: Session, query: str, limit: int = 10) -> List[models.Destination]:
+    results = search_index.search_destinations(db, query, limit)
+    if results is not None:
+        return results
     return db.query(models.Destination).filter(
         (models.Destination.name.ilike(f"%{query}%")) |
         (models.Destination.country.ilike(f"%{query}%")) |
@@ -114,6 +142,7 @@ def create_deal(db: Session, deal: schemas.DealCreate) -> models.Deal:
     db.add(db_deal)
     db.commit()
     db.refresh(db_deal)
+    deal_links.update(db_deal)
     return db_deal
 
 
@@ -127,7 +156,8 @@ def get_deals(
         limit: int = 20,
         deal_type: Optional[str] = None,
         featured_only: bool = False,
-        active_only: bool = True
+        active_only: bool = True,
+        after_id: Optional[int] = None
 ) -> List[models.Deal]:
     query = db.query(models.Deal)
 
@@ -137,8 +167,13 @@ def get_deals(
         query = query.filter(models.Deal.is_featured == True)
     if deal_type:
         query = query.filter(models.Deal.deal_type == deal_type)
+    if after_id is not None:
+        require_anchor(db, models.Deal, after_id)
+        query = query.filter(after_row(models.Deal, models.Deal.created_at, after_id))
 
-    return query.order_by(desc(models.Deal.created_at)).offset(skip).limit(limit).all()
+    return query.order_by(
+        desc(models.Deal.created_at), desc(models.Deal.id)
+    ).offset(skip).limit(limit).all()
 
 
 def get_deals_by_destination(db: Session, destination_id: int, limit: int = 10) -> List[models.Deal]:
@@ -156,16 +191,10 @@ def update_deal(db: Session, deal_id: int, deal: schemas.DealUpdate) -> Optional
             setattr(db_deal, key, value)
         db.commit()
         db.refresh(db_deal)
+        deal_links.update(db_deal)
     return db_deal
 
 
-def increment_deal_clicks(db: Session, deal_id: int) -> None:
-    db_deal = get_deal(db, deal_id)
-    if db_deal:
-        db_deal.click_count += 1
-        db.commit()
-
-
 def count_deals(db: Session, active_only: bool = True) -> int:
     query = db.query(models.Deal)
     if active_only:
@@ -188,7 +217,8 @@ def get_experiences(
         skip: int = 0,
         limit: int = 20,
         destination_id: Optional[int] = None,
-        category: Optional[str] = None
+        category: Optional[str] = None,
+        after_id: Optional[int] = None
 ) -> List[models.Experience]:
     query = db.query(models.Experience).filter(models.Experience.is_active == True)
 
@@ -196,14 +226,21 @@ def get_experiences(
         query = query.filter(models.Experience.destination_id == destination_id)
     if category:
         query = query.filter(models.Experience.category == category)
+    if after_id is not None:
+        require_anchor(db, models.Experience, after_id)
+        query = query.filter(
+            after_row(models.Experience, models.Experience.rating, after_id, nullable=True)
+        )
 
-    return query.order_by(desc(models.Experience.rating)).offset(skip).limit(limit).all()
+    # NULLS LAST pinned: Postgres would put unrated rows first (see after_row)
+    return query.order_by(
+        desc(models.Experience.rating).nulls_last(), desc(models.Experience.id)
+    ).offset(skip).limit(limit).all()
 
 
 # ============== Search Log CRUD ==============
 
-def create_search_log(
-        db: Session,
+def search_log_record(
         search_type: str,
         origin: Optional[str],
         destination: str,
@@ -213,21 +250,30 @@ def create_search_log(
         ip_address: Optional[str],
         user_agent: Optional[str],
         session_id: Optional[str]
-) -> models.SearchLog:
-    db_log = models.SearchLog(
-        search_type=search_type,
-        origin=origin,
-        destination=destination,
-        check_in=check_in,
-        check_out=check_out,
-        travelers=travelers,
-        ip_address=ip_address,
-        user_agent=user_agent,
-        session_id=session_id
-    )
-    db.add(db_log)
-    db.commit()
-    return db_log
+) -> Dict[str, Any]:
+    """A SearchLog row as a dict, timestamped now, for bulk insertion."""
+    return {
+        "search_type": search_type,
+        "origin": origin,
+        "destination": destination,
+        "check_in": check_in,
+        "check_out": check_out,
+        "travelers": travelers,
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "session_id": session_id,
+        "created_at": datetime.utcnow(),
+    }
+
+
+async def bulk_create_search_logs(db: AsyncSession, records: List[Dict[str, Any]]) -> int:
+    """Insert many search_log_record() rows in one statement and commit."""
+    if not records:
+        return 0
+    await db.execute(insert(models.SearchLog), records)
+    await _increment_rollups_async(db, rollups.SEARCHES, records)
+    await db.commit()
+    return len(records)
 
 
 # ============== Click Tracking CRUD ==============
@@ -243,38 +289,70 @@ def create_click_tracking(
         referrer: Optional[str],
         session_id: Optional[str]
 ) -> models.ClickTracking:
-    db_click = models.ClickTracking(
-        deal_id=deal_id,
-        experience_id=experience_id,
-        link_type=link_type,
-        affiliate_provider=affiliate_provider,
-        ip_address=ip_address,
-        user_agent=user_agent,
-        referrer=referrer,
-        session_id=session_id
+    record = click_tracking_record(
+        deal_id, experience_id, link_type, affiliate_provider,
+        ip_address, user_agent, referrer, session_id
     )
+    db_click = models.ClickTracking(**record)
     db.add(db_click)
+    _increment_rollups(db, rollups.CLICKS, [record])
     db.commit()
     return db_click
 
 
+def click_tracking_record(
+        deal_id: Optional[int],
+        experience_id: Optional[int],
+        link_type: str,
+        affiliate_provider: str,
+        ip_address: Optional[str],
+        user_agent: Optional[str],
+        referrer: Optional[str],
+        session_id: Optional[str]
+) -> Dict[str, Any]:
+    """A ClickTracking row as a dict, timestamped now, for bulk insertion."""
+    return {
+        "deal_id": deal_id,
+        "experience_id": experience_id,
+        "link_type": link_type,
+        "affiliate_provider": affiliate_provider,
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "referrer": referrer,
+        "session_id": session_id,
+        "created_at": datetime.utcnow(),
+    }
+
+
+async def bulk_record_clicks(db: AsyncSession, records: List[Dict[str, Any]]) -> int:
+    """
+    Insert many click_tracking_record() rows and add them to the deals'
+    click_count with one UPDATE per deal, all in a single transaction.
+    """
+    if not records:
+        return 0
+    await db.execute(insert(models.ClickTracking), records)
+    await _increment_rollups_async(db, rollups.CLICKS, records)
+
+    per_deal = Counter(r["deal_id"] for r in records if r["deal_id"] is not None)
+    for deal_id, clicks in sorted(per_deal.items()):
+        await db.execute(
+            update(models.Deal)
+            .where(models.Deal.id == deal_id)
+            .values(click_count=func.coalesce(models.Deal.click_count, 0) + clicks)
+        )
+    await db.commit()
+    return len(records)
+
+
 def count_clicks(db: Session, days: int = 30) -> int:
     since = datetime.utcnow() - timedelta(days=days)
-    return db.query(models.ClickTracking).filter(
-        models.ClickTracking.created_at >= since
-    ).count()
+    return rollups.count(db, rollups.CLICKS, since)
 
 
 def get_clicks_by_provider(db: Session, days: int = 30) -> dict:
     since = datetime.utcnow() - timedelta(days=days)
-    results = db.query(
-        models.ClickTracking.affiliate_provider,
-        func.count(models.ClickTracking.id)
-    ).filter(
-        models.ClickTracking.created_at >= since
-    ).group_by(models.ClickTracking.affiliate_provider).all()
-
-    return {provider: count for provider, count in results}
+    return rollups.count(db, rollups.CLICKS, since, by="affiliate_provider")
 
 
 # ============== Price Alert CRUD ==============
@@ -309,12 +387,20 @@ def delete_price_alert(db: Session, alert_id: int, email: str) -> bool:
 # ============== Analytics ==============
 
 def get_top_destinations(db: Session, limit: int = 5) -> List[dict]:
+    # All-time searches per destination, from the (exact) daily rollups
+    searches = db.query(
+        models.SearchRollup.destination,
+        func.sum(models.SearchRollup.count).label('searches')
+    ).filter(
+        models.SearchRollup.granularity == rollups.DAY
+    ).group_by(models.SearchRollup.destination).subquery()
+
     results = db.query(
         models.Destination.name,
-        func.count(models.SearchLog.id).label('search_count')
+        func.coalesce(func.sum(searches.c.searches), 0).label('search_count')
     ).join(
-        models.SearchLog,
-        models.Destination.name == models.SearchLog.destination,
+        searches,
+        models.Destination.name == searches.c.destination,
         isouter=True
     ).group_by(models.Destination.name).order_by(
         desc('search_count')
@@ -325,6 +411,20 @@ def get_top_destinations(db: Session, limit: int = 5) -> List[dict]:
 
 def get_recent_signups(db: Session, days: int = 7) -> int:
     since = datetime.utcnow() - timedelta(days=days)
-    return db.query(models.Subscriber).filter(
-        models.Subscriber.created_at >= since
-    ).count()
+    return rollups.count(db, rollups.SIGNUPS, since)
+
+
+# ============== Rollup maintenance ==============
+
+def _increment_rollups(db: Session, metric: rollups.Metric, records: List[Dict[str, Any]]) -> None:
+    stmt = rollups.increment_statement(db.get_bind().dialect.name, metric, records)
+    if stmt is not None:
+        db.execute(stmt)
+
+
+async def _increment_rollups_async(
+        db: AsyncSession, metric: rollups.Metric, records: List[Dict[str, Any]]
+) -> None:
+    stmt = rollups.increment_statement(db.get_bind().dialect.name, metric, records)
+    if stmt is not None:
+        await db.execute(stmt)
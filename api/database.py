@@ -1,20 +1,154 @@
 """
 Database configuration and session management
 """
-from sqlalchemy import create_engine
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.schema import CreateIndex
 from .config import get_settings
+from . import deadline
+from .deadline import sqlite_progress_handler, sqlite_progress_handler_for
+from .metrics import observe_query
+from .query_stats import query_stats
+from . import timing
 
 settings = get_settings()
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Needed for SQLite
-)
+# SQLite pragmas applied to every new connection (see DB_SQLITE_* settings)
+_SQLITE_PRAGMAS = {
+    "journal_mode": settings.DB_SQLITE_JOURNAL_MODE,
+    "synchronous": settings.DB_SQLITE_SYNCHRONOUS,
+    "busy_timeout": settings.DB_SQLITE_BUSY_TIMEOUT_MS,
+    "cache_size": -settings.DB_SQLITE_CACHE_SIZE_KB,  # Negative = KiB, not pages
+    "mmap_size": settings.DB_SQLITE_MMAP_SIZE,
+    "temp_store": settings.DB_SQLITE_TEMP_STORE,
+}
+
+
+def _engine_options(url: str, is_async: bool = False) -> dict:
+    """create_engine() keyword arguments for the configured backend."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        options = {"connect_args": {"check_same_thread": False}}  # Needed for SQLite
+        if parsed.database in (None, "", ":memory:"):
+            return options  # In-memory databases keep SQLAlchemy's single-connection pool
+        # aiosqlite defaults to NullPool; reuse connections like the sync engine does
+        options.update(
+            poolclass=AsyncAdaptedQueuePool if is_async else QueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+        return options
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,  # Outlive server-side idle timeouts
+        "pool_pre_ping": True,
+    }
+
+
+def _apply_sqlite_pragmas(dbapi_connection) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in _SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def _time_statements(engine) -> None:
+    """Time every statement for the metrics, the request's Server-Timing and query_stats."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        observe_query(statement, elapsed)
+        timing.record(timing.DB, elapsed)
+        if query_stats is not None:
+            query_stats.record(conn, statement, parameters, executemany, elapsed)
+
+
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL))
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite_connection(dbapi_connection, connection_record):
+        """Apply the pragmas and abort statements that outlive the request deadline."""
+        _apply_sqlite_pragmas(dbapi_connection)
+        dbapi_connection.set_progress_handler(sqlite_progress_handler, 10000)
+
+_time_statements(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async drivers for the supported databases (both in requirements.txt),
+# used by the async code paths (ingestion, link resolver)
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def _async_database_url(url: str) -> str:
+    """Swap the sync driver in DATABASE_URL for its async counterpart."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise ValueError(
+            f"DATABASE_URL uses {backend}, which has no async driver configured; "
+            f"supported backends: {', '.join(_ASYNC_DRIVERS)}"
+        )
+    return parsed.set(drivername=_ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+async_engine = create_async_engine(
+    _async_database_url(settings.DATABASE_URL), **_engine_options(settings.DATABASE_URL, is_async=True)
+)
+
+if async_engine.dialect.name == "sqlite":
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _configure_async_sqlite_connection(dbapi_connection, connection_record):
+        """
+        Apply the pragmas and abort statements that outlive the request deadline.
+
+        aiosqlite runs statements in its own thread, which does not see the
+        request's context, so each statement hands its deadline over through
+        the connection record's info.
+        """
+        _apply_sqlite_pragmas(dbapi_connection)
+        sqlite_connection = dbapi_connection.driver_connection._conn  # The sqlite3 connection
+        sqlite_connection.set_progress_handler(
+            sqlite_progress_handler_for(connection_record.info), 10000
+        )
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def _pass_deadline(conn, cursor, statement, parameters, context, executemany):
+        conn.connection.info["deadline"] = deadline.current()
+
+    @event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+    def _clear_deadline(conn, cursor, statement, parameters, context, executemany):
+        conn.connection.info["deadline"] = None
+
+    @event.listens_for(async_engine.sync_engine, "handle_error")
+    def _clear_deadline_on_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and not conn.invalidated:
+            conn.connection.info["deadline"] = None
+
+_time_statements(async_engine.sync_engine)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -30,3 +164,18 @@ def get_db():
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
+    ensure_indexes()
+
+
+def ensure_indexes():
+    """
+    Create indexes declared in models.py that an existing database lacks.
+
+    create_all() only creates indexes together with new tables, so databases
+    created before an index was added get it here. IF NOT EXISTS keeps
+    workers starting at the same time from racing each other.
+    """
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
@@ -0,0 +1,130 @@
+"""
+Request-scoped deadlines
+
+Every request gets a time budget: the REQUEST_DEADLINE_SECONDS default,
+optionally shortened by the client with an X-Request-Timeout header
+(seconds) and by individual endpoints via the budget() dependency. The
+absolute deadline lives in a context variable, so upstream calls, SQLite
+queries and fan-out tasks started while handling the request all see it.
+"""
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+from fastapi import Depends
+
+from .config import get_settings
+
+settings = get_settings()
+
+DEADLINE_HEADER = "X-Request-Timeout"
+
+# Absolute deadline (time.monotonic()) for the current request, if any
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """The request ran out of its time budget before the call finished."""
+
+    def __init__(self, message: str = "Request deadline exceeded"):
+        super().__init__(message)
+
+
+def parse_header(value: Optional[str]) -> float:
+    """Budget in seconds for a request, from its X-Request-Timeout header."""
+    budget_seconds = settings.REQUEST_DEADLINE_SECONDS
+    if value:
+        try:
+            requested = float(value)
+        except ValueError:
+            requested = 0
+        if requested > 0:
+            budget_seconds = min(requested, settings.REQUEST_DEADLINE_MAX_SECONDS)
+    return budget_seconds
+
+
+def start(seconds: float) -> None:
+    """Set the deadline for the current request."""
+    _deadline.set(time.monotonic() + seconds)
+
+
+def tighten(seconds: float) -> None:
+    """Shorten the current deadline to at most `seconds` from now."""
+    candidate = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is None or candidate < current:
+        _deadline.set(candidate)
+
+
+def clear() -> None:
+    """Remove the deadline (for background work outliving the request)."""
+    _deadline.set(None)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline, or None if there is no deadline."""
+    current = _deadline.get()
+    if current is None:
+        return None
+    return current - time.monotonic()
+
+
+def current() -> Optional[float]:
+    """The current request's absolute deadline (time.monotonic()), if any."""
+    return _deadline.get()
+
+
+def expired() -> bool:
+    """Whether the current request's deadline has passed."""
+    current = _deadline.get()
+    return current is not None and time.monotonic() >= current
+
+
+async def run_within_deadline(awaitable: Awaitable[Any]) -> Any:
+    """Await something, raising DeadlineExceeded if the deadline hits first."""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded()
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded()
+
+
+def budget(seconds: float):
+    """
+    Dependency that caps an endpoint's deadline at `seconds`.
+
+    Usage: @router.get("/path", dependencies=[deadline.budget(5.0)])
+    """
+    async def apply_budget():
+        tighten(seconds)
+
+    return Depends(apply_budget)
+
+
+def sqlite_progress_handler() -> int:
+    """
+    SQLite progress callback: a non-zero return aborts the running
+    statement ("interrupted") once the request deadline has passed.
+    """
+    return 1 if expired() else 0
+
+
+def sqlite_progress_handler_for(info: dict) -> Callable[[], int]:
+    """
+    Progress callback for connections whose statements run outside the
+    request's context (aiosqlite's thread): it checks the deadline stored
+    in info["deadline"] by the statement hooks in database.py.
+    """
+    def handler() -> int:
+        current_deadline = info.get("deadline")
+        return 1 if current_deadline is not None and time.monotonic() >= current_deadline else 0
+
+    return handler
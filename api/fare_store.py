@@ -0,0 +1,185 @@
+"""
+Persistent on-disk fare store
+
+The in-memory response cache starts empty in every uvicorn worker after
+each deploy, so the first minutes hammer the upstream. Fare responses
+(prices/cheap, prices/direct, prices/calendar, prices_for_dates and the
+Hotellook cache.json) are therefore also written to a dedicated SQLite
+file in WAL mode, keyed by the normalized request and indexed by route and
+date. Every worker reads it on a memory miss, and it survives restarts.
+
+Expiry times are wall-clock (time.time()) so they mean the same thing in
+every process. Set FARE_STORE_PATH to "" to disable the store.
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+from .config import get_settings
+from .logger import log_info, log_warning
+
+settings = get_settings()
+
+# Upstream endpoints whose responses are persisted
+PERSISTED_PATHS = (
+    "/v1/prices/cheap",
+    "/v1/prices/direct",
+    "/v1/prices/calendar",
+    "/aviasales/v3/prices_for_dates",
+    "/api/v2/cache.json",
+)
+
+# Purge expired rows every this many writes
+_PURGE_EVERY = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fares (
+    cache_key   TEXT PRIMARY KEY,
+    endpoint    TEXT NOT NULL,
+    route       TEXT,
+    travel_date TEXT,
+    body        BLOB NOT NULL,
+    fresh_until REAL NOT NULL,
+    keep_until  REAL NOT NULL,
+    stored_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_fares_route_date ON fares (route, travel_date);
+CREATE INDEX IF NOT EXISTS ix_fares_keep_until ON fares (keep_until);
+"""
+
+
+def is_persisted(url: str) -> bool:
+    """Whether responses from this upstream URL belong in the fare store."""
+    return url.endswith(PERSISTED_PATHS)
+
+
+def _key_parts(key: Tuple) -> Tuple[str, str, Optional[str], Optional[str]]:
+    """(cache_key, endpoint, route, travel_date) for a cache.make_key() key."""
+    url, params = key
+    values = dict(params)
+    if "location" in values:
+        route = values["location"].upper()
+    else:
+        route = "-".join(v for v in (values.get("origin"), values.get("destination")) if v) or None
+    travel_date = (
+        values.get("depart_date") or values.get("departure_at") or values.get("checkIn")
+    )
+    return f"{url}?{urlencode(params)}", url, route, travel_date
+
+
+class FareStore:
+    """SQLite-backed store of upstream fare responses, shared by workers."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def open(self) -> None:
+        """Open the file, switch it to WAL mode and create the schema."""
+        with self._lock:
+            if self._conn is not None:
+                return
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            conn.execute("DELETE FROM fares WHERE keep_until < ?", (time.time(),))
+            conn.commit()
+            self._conn = conn
+        log_info(f"Fare store ready at {self.path}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get(self, key: Tuple) -> Optional[Tuple[bytes, float, float]]:
+        """Return (body, fresh_until, keep_until) if a retained row exists."""
+        cache_key = _key_parts(key)[0]
+        with self._lock:
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "SELECT body, fresh_until, keep_until FROM fares "
+                "WHERE cache_key = ? AND keep_until > ?",
+                (cache_key, time.time()),
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return bytes(row[0]), row[1], row[2]
+
+    def put(self, key: Tuple, body: bytes, ttl: float, stale_ttl: float = 0) -> None:
+        """Store a body fresh for ttl seconds and retained stale_ttl longer."""
+        cache_key, endpoint, route, travel_date = _key_parts(key)
+        now = time.time()
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fares "
+                "(cache_key, endpoint, route, travel_date, body, fresh_until, keep_until, stored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (cache_key, endpoint, route, travel_date, body,
+                 now + ttl, now + ttl + max(stale_ttl, 0), now),
+            )
+            self._writes += 1
+            if self._writes % _PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM fares WHERE keep_until < ?", (now,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._conn is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self._writes,
+            "errors": self.errors,
+        }
+
+
+fare_store = FareStore(settings.FARE_STORE_PATH) if settings.FARE_STORE_PATH else None
+
+
+def open_fare_store() -> None:
+    """Open the shared store (called from main.lifespan)."""
+    if fare_store is not None:
+        fare_store.open()
+
+
+def close_fare_store() -> None:
+    if fare_store is not None:
+        fare_store.close()
+
+
+async def load(key: Tuple) -> Optional[Tuple[bytes, float, float]]:
+    """Read a stored response off the event loop; errors count as a miss."""
+    if fare_store is None or not is_persisted(key[0]):
+        return None
+    try:
+        return await asyncio.to_thread(fare_store.get, key)
+    except sqlite3.Error as e:
+        fare_store.errors += 1
+        log_warning(f"Fare store read failed: {e}")
+        return None
+
+
+async def save(key: Tuple, body: bytes, ttl: float, stale_ttl: float = 0) -> None:
+    """Write a response off the event loop; errors are logged and ignored."""
+    if fare_store is None or not is_persisted(key[0]):
+        return
+    try:
+        await asyncio.to_thread(fare_store.put, key, body, ttl, stale_ttl)
+    except sqlite3.Error as e:
+        fare_store.errors += 1
+        log_warning(f"Fare store write failed: {e}")
@@ -0,0 +1,354 @@
+"""
+Shared upstream HTTP client
+
+One pooled httpx.AsyncClient per worker process, so Travelpayouts and
+Hotellook calls reuse keep-alive connections instead of paying a new
+TCP/TLS handshake on every search.
+
+The client is created and closed by main.lifespan. Code running outside
+the app (scripts, the REPL) gets a lazily created client instead.
+
+All upstream GETs go through fetch_json/get_json, which layer the response
+cache (backed by the on-disk fare store, with optional
+stale-while-revalidate), request coalescing, the per-host circuit breaker
+and the request deadline on top of the shared client.
+"""
+import asyncio
+import httpx
+import json
+import time
+from typing import Any, Awaitable, Dict, Optional, Set, Tuple
+
+from . import fare_store
+from .cache import make_key, response_cache
+from . import deadline
+from .config import get_settings
+from .deadline import DeadlineExceeded, run_within_deadline
+from .logger import log_warning
+from .metrics import observe_upstream
+from . import timing
+from .ratelimit import PRIORITY_BACKGROUND, acquire_for, bucket_for, get_priority, set_priority
+from .resilience import CircuitBreaker, get_breaker, hedged, is_failure
+from .singleflight import upstream_flights
+
+settings = get_settings()
+
+# Values for the X-Cache-Status response header
+CACHE_HIT = "HIT"
+CACHE_MISS = "MISS"
+CACHE_STALE = "STALE"
+CACHE_STALE_IF_ERROR = "STALE-IF-ERROR"
+
+_client: Optional[httpx.AsyncClient] = None
+
+# Rate-limit priority of each coalesced upstream call in progress
+_flight_priority: Dict[Tuple, int] = {}
+
+# Keys with a background refresh in progress, and the tasks doing it
+_revalidating: Set[Tuple] = set()
+_background_tasks: Set["asyncio.Task"] = set()
+
+
+def _build_client() -> httpx.AsyncClient:
+    """Build the pooled client from settings."""
+    limits = httpx.Limits(
+        max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        settings.UPSTREAM_TIMEOUT,
+        connect=settings.UPSTREAM_CONNECT_TIMEOUT,
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        timeout=timeout,
+        http2=settings.UPSTREAM_HTTP2,
+    )
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """Create the shared client (called from main.lifespan)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and its pooled connections."""
+    global _client
+    for task in list(_background_tasks):
+        task.cancel()
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared client, creating it if the app lifespan did not."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+def _hedge_delay(breaker: CircuitBreaker) -> Optional[float]:
+    """Delay before a hedged duplicate request, or None to not hedge."""
+    if not settings.UPSTREAM_HEDGE_ENABLED:
+        return None
+    p95 = breaker.p95_latency()
+    if p95 is None:
+        return None
+    return max(p95, settings.UPSTREAM_HEDGE_MIN_DELAY)
+
+
+def _back_off(url: httpx.URL, response: httpx.Response) -> None:
+    """Pause the API family's bucket after a 429, honouring Retry-After."""
+    bucket = bucket_for(url)
+    if bucket is None:
+        return
+    try:
+        retry_after = float(response.headers.get("retry-after", 1))
+    except ValueError:
+        retry_after = 1.0
+    bucket.pause(min(retry_after, 60.0))
+    log_warning(f"Upstream 429 from {url.host}{url.path}, pausing {bucket.name} for {retry_after}s")
+
+
+async def _fetch(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+) -> bytes:
+    """
+    GET an upstream URL with the shared client and return the raw body.
+
+    Waits for an outbound rate-limit token first (RateLimitExceeded when
+    none comes in time), then goes through the host's circuit breaker,
+    which raises CircuitOpenError (an httpx.RequestError) without calling
+    the upstream while it is open. Bounded by the request deadline; raises
+    DeadlineExceeded (an httpx.TimeoutException) when it runs out.
+    """
+    client = get_http_client()
+    kwargs = {"params": params}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+
+    upstream_url = httpx.URL(url)
+    breaker = get_breaker(upstream_url.host)
+    try:
+        # Local queueing is neither an upstream failure nor upstream latency
+        await run_within_deadline(acquire_for(upstream_url))
+        breaker.allow_request()
+    except httpx.HTTPError as e:
+        observe_upstream(upstream_url, None, e)
+        raise
+
+    attempts = 0
+
+    async def attempt() -> httpx.Response:
+        nonlocal attempts
+        attempts += 1
+        if attempts > 1:  # A hedged duplicate needs a token of its own
+            await acquire_for(upstream_url)
+        return await client.get(url, **kwargs)
+
+    started = time.perf_counter()
+    recorded = False
+    try:
+        response = await run_within_deadline(hedged(attempt, _hedge_delay(breaker)))
+        if response.status_code == 429:
+            _back_off(upstream_url, response)
+        response.raise_for_status()
+        elapsed = time.perf_counter() - started
+        breaker.record(False, elapsed)
+        recorded = True
+        observe_upstream(upstream_url, elapsed)
+        return response.content
+    except DeadlineExceeded as e:
+        # Our own budget ran out; says nothing about the upstream's health
+        observe_upstream(upstream_url, time.perf_counter() - started, e)
+        raise
+    except httpx.HTTPError as e:
+        elapsed = time.perf_counter() - started
+        breaker.record(is_failure(e), elapsed)
+        recorded = True
+        observe_upstream(upstream_url, elapsed, e)
+        raise
+    finally:
+        if not recorded:
+            breaker.release()
+        timing.record(timing.UPSTREAM, time.perf_counter() - started)
+
+
+def _is_cacheable(data: Any) -> bool:
+    """Only cache payloads that Travelpayouts marks as successful."""
+    if isinstance(data, dict):
+        return data.get("success", True) is not False
+    return True
+
+
+async def _fetch_and_store(
+    key: Tuple,
+    url: str,
+    params: Optional[Dict[str, Any]],
+    timeout: Optional[float],
+    cache_ttl: int,
+    stale_ttl: int,
+) -> bytes:
+    """Fetch from upstream and store cacheable bodies in memory and on disk."""
+    content = await _fetch(url, params, timeout)
+    if cache_ttl > 0 and _is_cacheable(json.loads(content)):
+        response_cache.set(key, content, cache_ttl, stale_ttl)
+        _spawn(fare_store.save(key, content, cache_ttl, stale_ttl))
+    return content
+
+
+async def _shared_fetch(key: Tuple, *args) -> bytes:
+    """
+    The coalesced upstream call behind _refresh, shared by all its waiters.
+
+    It runs in the context of whichever caller started it, so it drops that
+    caller's deadline (each waiter applies its own) and takes the most
+    urgent priority among the callers waiting when it starts.
+    """
+    deadline.clear()
+    set_priority(_flight_priority[key])
+    try:
+        return await _fetch_and_store(key, *args)
+    finally:
+        del _flight_priority[key]
+
+
+async def _refresh(key: Tuple, *args) -> Any:
+    """Fetch from upstream (coalesced), update the caches and return the JSON."""
+    priority = get_priority()
+
+    def start() -> Awaitable[bytes]:
+        _flight_priority[key] = priority
+        return _shared_fetch(key, *args)
+
+    async def join() -> bytes:
+        if key in _flight_priority:
+            _flight_priority[key] = min(_flight_priority[key], priority)
+        return await upstream_flights.do(key, start)
+
+    content = await run_within_deadline(join())
+    return json.loads(content)
+
+
+async def _lookup(key: Tuple) -> Optional[Tuple[bytes, float]]:
+    """
+    Find a cached body in memory, falling back to the shared fare store.
+
+    Returns (body, overdue) like TTLCache.lookup. Entries found on disk are
+    promoted into the memory cache with their remaining lifetime.
+    """
+    entry = response_cache.lookup(key)
+    if entry is not None:
+        return entry
+
+    stored = await fare_store.load(key)
+    if stored is None:
+        return None
+    content, fresh_until, keep_until = stored
+    now = time.time()
+    response_cache.set(key, content, fresh_until - now, keep_until - fresh_until)
+    return content, now - fresh_until
+
+
+def _spawn(coro) -> None:
+    """Run a coroutine in the background, keeping a reference to it."""
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _revalidate(key: Tuple, *args) -> None:
+    """Background refresh of a stale entry; failures keep the stale copy."""
+    deadline.clear()  # Not bound by the request that triggered it
+    set_priority(PRIORITY_BACKGROUND)
+    try:
+        await _refresh(key, *args)
+    except httpx.HTTPError as e:
+        log_warning(f"Background refresh failed for {key[0]}: {e}")
+    finally:
+        _revalidating.discard(key)
+
+
+def _schedule_revalidation(key: Tuple, *args) -> None:
+    """Start at most one background refresh per key."""
+    if key in _revalidating:
+        return
+    _revalidating.add(key)
+    _spawn(_revalidate(key, *args))
+
+
+async def fetch_json(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+    cache_ttl: int = 0,
+    stale_while_revalidate: int = 0,
+    stale_if_error: int = 0,
+) -> Tuple[Any, str]:
+    """
+    GET a JSON document and report where it came from.
+
+    Returns (data, cache_status) where cache_status is one of CACHE_HIT,
+    CACHE_MISS, CACHE_STALE or CACHE_STALE_IF_ERROR.
+
+    - Fresh cached entries (younger than cache_ttl) are returned as-is.
+    - Up to stale_while_revalidate seconds past cache_ttl, the stale entry
+      is returned immediately and refreshed in a background task.
+    - Beyond that the request waits for the upstream; if it fails within
+      stale_if_error seconds past cache_ttl, the stale entry is served.
+
+    Concurrent identical upstream requests are coalesced into one call.
+    Raises httpx.HTTPStatusError / httpx.RequestError when there is
+    nothing to fall back to.
+    """
+    key = make_key(url, params)
+    stale_ttl = max(stale_while_revalidate, stale_if_error)
+    args = (url, params, timeout, cache_ttl, stale_ttl)
+
+    stale = None
+    if cache_ttl > 0:
+        entry = await _lookup(key)
+        if entry is not None:
+            content, overdue = entry
+            if overdue <= 0:
+                return json.loads(content), CACHE_HIT
+            if overdue <= stale_while_revalidate:
+                _schedule_revalidation(key, *args)
+                return json.loads(content), CACHE_STALE
+            stale = content
+
+    try:
+        return await _refresh(key, *args), CACHE_MISS
+    except httpx.HTTPError as e:
+        if stale is None:
+            raise
+        log_warning(f"Serving stale data for {url}: {e}")
+        return json.loads(stale), CACHE_STALE_IF_ERROR
+
+
+async def get_json(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+    cache_ttl: int = 0,
+) -> Any:
+    """
+    GET a JSON document from an upstream API using the shared client.
+
+    With cache_ttl > 0 the response body is served from, and stored in,
+    the shared response cache under the normalized parameter set.
+    Concurrent identical requests are coalesced into one upstream call.
+
+    Raises httpx.HTTPStatusError for non-2xx responses and
+    httpx.RequestError for connection problems, like a plain httpx call.
+    """
+    data, _ = await fetch_json(url, params, timeout, cache_ttl)
+    return data
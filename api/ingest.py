@@ -0,0 +1,205 @@
+"""
+Write-behind ingestion of analytics rows
+
+Committing one SearchLog row per search, or a ClickTracking row plus a
+click_count update per deal click, puts database fsyncs on the critical
+path of every request. BatchWriter instead queues records
+in memory and a background task writes them in batches: whenever
+max_batch records are waiting or flush_interval_ms has passed since the
+first one arrived. The queue is bounded; when it is full, records are
+either dropped (counted) or the caller waits, depending on the policy.
+
+Writers are started and flushed on shutdown by main.lifespan.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .config import get_settings
+from .database import AsyncSessionLocal
+from .logger import log_error, log_warning
+from . import crud
+
+settings = get_settings()
+
+OVERFLOW_DROP = "drop"
+OVERFLOW_BLOCK = "block"
+
+# Queued by stop(): the writer flushes what it holds and exits
+_STOP = object()
+
+
+class BatchWriter:
+    """Buffer records and hand them to flush_fn in batches."""
+
+    def __init__(
+        self,
+        name: str,
+        flush_fn: Callable[[List[Dict[str, Any]]], Awaitable[None]],
+        max_batch: int = 200,
+        flush_interval_ms: int = 250,
+        max_queue: int = 10000,
+        overflow: str = OVERFLOW_DROP,
+    ):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue = max_queue
+        self.overflow = overflow
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.total_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and flush everything still queued."""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+        remaining = []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        for i in range(0, len(remaining), self.max_batch):
+            await self._flush(remaining[i:i + self.max_batch])
+
+    async def submit(self, record: Dict[str, Any]) -> None:
+        """
+        Queue a record for the next batch.
+
+        Without a running writer (scripts, no lifespan) the record is
+        written immediately.
+        """
+        self.submitted += 1
+        if not self.running:
+            await self._flush([record])
+            return
+
+        if self.overflow == OVERFLOW_BLOCK:
+            await self._queue.put(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "submitted": self.submitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "avg_batch_size": round(self.written / self.batches, 2) if self.batches else 0.0,
+            "avg_flush_ms": round(self.total_flush_ms / self.batches, 2) if self.batches else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            flush_at = loop.time() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = flush_at - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        started = time.perf_counter()
+        try:
+            await self.flush_fn(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            log_error(e, context=f"{self.name} batch flush ({len(batch)} records)")
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.written += len(batch)
+        self.batches += 1
+        self.total_flush_ms += elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        if elapsed_ms > 1000:
+            log_warning(f"Slow {self.name} flush: {len(batch)} records in {elapsed_ms:.0f}ms")
+
+
+async def _write_search_logs(records: List[Dict[str, Any]]) -> None:
+    async with AsyncSessionLocal() as db:
+        await crud.bulk_create_search_logs(db, records)
+
+
+async def _write_clicks(records: List[Dict[str, Any]]) -> None:
+    async with AsyncSessionLocal() as db:
+        await crud.bulk_record_clicks(db, records)
+
+
+search_log_writer = BatchWriter(
+    "search_logs",
+    _write_search_logs,
+    max_batch=settings.INGEST_BATCH_SIZE,
+    flush_interval_ms=settings.INGEST_FLUSH_INTERVAL_MS,
+    max_queue=settings.INGEST_MAX_QUEUE,
+    overflow=settings.INGEST_OVERFLOW_POLICY,
+)
+
+# Deal clicks: rows plus aggregated click_count increments per batch
+click_writer = BatchWriter(
+    "clicks",
+    _write_clicks,
+    max_batch=settings.INGEST_BATCH_SIZE,
+    flush_interval_ms=settings.INGEST_FLUSH_INTERVAL_MS,
+    max_queue=settings.INGEST_MAX_QUEUE,
+    overflow=settings.INGEST_OVERFLOW_POLICY,
+)
+
+_writers = [search_log_writer, click_writer]
+
+
+async def start_writers() -> None:
+    """Start all batch writers (called from main.lifespan)."""
+    for writer in _writers:
+        await writer.start()
+
+
+async def stop_writers() -> None:
+    """Flush and stop all batch writers (called from main.lifespan)."""
+    for writer in _writers:
+        await writer.stop()
+
+
+def ingest_stats() -> Dict[str, Dict[str, Any]]:
+    """Queue, batch size and flush latency metrics, for /health."""
+    return {writer.name: writer.stats() for writer in _writers}
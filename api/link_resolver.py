@@ -0,0 +1,159 @@
+"""
+In-memory affiliate link resolver
+
+/deals/{id}/redirect is the revenue path and is hit far more often than any
+listing, but it only needs a deal's affiliate link and provider. DealLinks
+keeps exactly that for every deal in a dict, loaded at startup and updated
+by crud.create_deal / crud.update_deal, so redirects are answered without a
+database round trip.
+
+Each worker has its own copy. A deal created by another worker is loaded on
+first use, and the whole map is reloaded every LINK_RESOLVER_REFRESH_SECONDS
+to pick up edits made elsewhere. Ids that are not in the database are
+remembered for LINK_RESOLVER_MISS_TTL_SECONDS (or until the next reload),
+so requests for unknown deals do not query the database every time.
+"""
+import asyncio
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .database import SessionLocal, AsyncSessionLocal
+from .logger import log_info, log_warning
+from . import models
+
+settings = get_settings()
+
+# Unknown deal ids remembered at most, per worker
+_MAX_MISSING = 10000
+
+_COLUMNS = (
+    models.Deal.id,
+    models.Deal.affiliate_link,
+    models.Deal.affiliate_provider,
+    models.Deal.is_active,
+)
+
+
+class DealLink(NamedTuple):
+    link: Optional[str]
+    provider: Optional[str]
+    is_active: bool
+
+
+class DealLinks:
+    """deal id -> DealLink map for one worker."""
+
+    def __init__(self):
+        self._links: Dict[int, DealLink] = {}
+        self._missing: Dict[int, float] = {}  # Unknown deal id -> expiry (monotonic)
+        self.hits = 0
+        self.misses = 0
+        self.not_found = 0
+        self.reloads = 0
+
+    def load(self, db: Session) -> int:
+        """Replace the map with every deal in the database."""
+        rows = db.execute(select(*_COLUMNS)).all()
+        self._links = {row.id: _link(row) for row in rows}
+        self._missing = {}
+        self.reloads += 1
+        return len(self._links)
+
+    def get(self, deal_id: int) -> Optional[DealLink]:
+        entry = self._links.get(deal_id)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    async def resolve(self, deal_id: int) -> Optional[DealLink]:
+        """get(), falling back to the database for deals not loaded yet."""
+        entry = self.get(deal_id)
+        if entry is not None:
+            return entry
+        if self._missing.get(deal_id, 0) > time.monotonic():
+            self.not_found += 1
+            return None
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(
+                select(*_COLUMNS).where(models.Deal.id == deal_id)
+            )).first()
+        if row is None:
+            entry = self._links.get(deal_id)  # Created while we were querying
+            if entry is None:
+                self._remember_missing(deal_id)
+            return entry
+        entry = self._links[deal_id] = _link(row)
+        return entry
+
+    def update(self, deal: models.Deal) -> None:
+        """Record a created or updated deal."""
+        self._links[deal.id] = _link(deal)
+        self._missing.pop(deal.id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "deals": len(self._links),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_found": self.not_found,
+            "known_missing": len(self._missing),
+            "reloads": self.reloads,
+        }
+
+    def _remember_missing(self, deal_id: int) -> None:
+        ttl = settings.LINK_RESOLVER_MISS_TTL_SECONDS
+        if ttl <= 0:
+            return
+        self._missing.pop(deal_id, None)
+        if len(self._missing) >= _MAX_MISSING:
+            del self._missing[next(iter(self._missing))]  # Oldest first
+        self._missing[deal_id] = time.monotonic() + ttl
+
+
+def _link(row) -> DealLink:
+    return DealLink(row.affiliate_link, row.affiliate_provider, bool(row.is_active))
+
+
+deal_links = DealLinks()
+
+_refresh_task: Optional[asyncio.Task] = None
+
+
+def _reload() -> int:
+    with SessionLocal() as db:
+        return deal_links.load(db)
+
+
+async def _refresh_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.LINK_RESOLVER_REFRESH_SECONDS)
+        try:
+            await asyncio.to_thread(_reload)
+        except Exception as e:
+            log_warning(f"Deal link reload failed: {e}")
+
+
+async def start_link_resolver() -> None:
+    """Load all deal links and start the periodic reload (main.lifespan)."""
+    global _refresh_task
+    count = await asyncio.to_thread(_reload)
+    log_info(f"Loaded affiliate links for {count} deals")
+    if settings.LINK_RESOLVER_REFRESH_SECONDS > 0:
+        _refresh_task = asyncio.create_task(_refresh_periodically())
+
+
+async def stop_link_resolver() -> None:
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
@@ -2,17 +2,55 @@
 Logging configuration for TripCompare API
 
 Provides structured logging with file rotation and console output.
+
+Records are not written on the calling thread: the logger only has a
+QueueHandler that puts them on a bounded queue, and a QueueListener thread
+formats them and does the file and console I/O. When the queue is full the
+record is dropped and counted rather than blocking the event loop.
+stop_logging() (main.lifespan shutdown) flushes the queue.
 """
+import atexit
 import logging
+import queue
 import sys
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .config import get_settings
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that counts records it cannot enqueue instead of blocking."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge the arguments into the message; formatting (including
+        # tracebacks) is left to the listener's handlers
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_queue_handler: Optional[_DroppingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+_handlers: List[logging.Handler] = []
 
 
 def setup_logger(name: str = "tripcompare", log_level: str = "INFO") -> logging.Logger:
     """
-    Setup logger with both file and console handlers.
+    Setup logger with both file and console handlers, written by a
+    background listener thread.
 
     Args:
         name: Logger name
@@ -71,14 +109,46 @@ def setup_logger(name: str = "tripcompare", log_level: str = "INFO") -> logging.
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(detailed_formatter)
 
-    # Add handlers to logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    logger.addHandler(error_handler)
+    # Handlers run on the listener thread; the logger only enqueues
+    global _queue_handler, _listener, _handlers
+    _handlers = [file_handler, console_handler, error_handler]
+    _queue_handler = _DroppingQueueHandler(queue.Queue(get_settings().LOG_QUEUE_SIZE))
+    _listener = QueueListener(_queue_handler.queue, *_handlers, respect_handler_level=True)
+    _listener.start()
+    logger.addHandler(_queue_handler)
+    atexit.register(stop_logging)
 
     return logger
 
 
+def stop_logging() -> None:
+    """
+    Write out queued records and stop the listener thread. Later records
+    are written synchronously.
+    """
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+    logger.removeHandler(_queue_handler)
+    for handler in _handlers:
+        logger.addHandler(handler)
+    if _queue_handler.dropped:
+        logger.warning(f"Dropped {_queue_handler.dropped} log records (queue full)")
+
+
+def logging_stats() -> Dict[str, Any]:
+    """Queue depth and dropped record count, for /health."""
+    if _queue_handler is None:
+        return {}
+    return {
+        "queued": _queue_handler.queue.qsize(),
+        "max_queue": _queue_handler.queue.maxsize,
+        "dropped": _queue_handler.dropped,
+    }
+
+
 # Create default logger instance
 logger = setup_logger()
 
@@ -90,6 +160,13 @@ def log_api_call(endpoint: str, method: str, status_code: int, duration_ms: floa
     )
 
 
+def log_slow_request(endpoint: str, method: str, status_code: int, duration_ms: float, breakdown: str):
+    """Log a request slower than SLOW_REQUEST_MS with its timing breakdown."""
+    logger.warning(
+        f"Slow request | {method} {endpoint} | Status: {status_code} | Duration: {duration_ms:.2f}ms | {breakdown}"
+    )
+
+
 def log_external_api_call(provider: str, endpoint: str, status_code: int, duration_ms: float):
     """Log external API call details."""
     logger.info(
@@ -6,20 +6,35 @@ for flights, hotels, experiences, and vacation packages.
 """
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
+from sqlalchemy.exc import OperationalError
 import time
 
+from . import deadline
+
 from .config import get_settings
-from .database import init_db
-from .logger import logger, log_api_call, log_error, log_info
+from .cache import response_cache
+from .database import init_db, engine, async_engine
+from .fare_store import fare_store, open_fare_store, close_fare_store
+from .http_client import start_http_client, close_http_client
+from .ingest import start_writers, stop_writers, ingest_stats
+from .link_resolver import deal_links, start_link_resolver, stop_link_resolver
+from . import metrics, timing
+from .pagination import NEXT_CURSOR_HEADER
+from . import search_index
+from .ratelimit import rate_limit_stats
+from .resilience import breaker_stats
+from .singleflight import upstream_flights
+from .logger import logger, log_api_call, log_error, log_info, log_slow_request, logging_stats, stop_logging
 from .routers import (
     subscribers_router,
     destinations_router,
     deals_router,
     experiences_router,
     search_router,
-    analytics_router
+    analytics_router,
+    admin_router
 )
 
 settings = get_settings()
@@ -27,13 +42,27 @@ settings = get_settings()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database on startup"""
+    """Initialize database and shared upstream client on startup"""
     log_info("Starting TripCompare API...")
     init_db()
+    search_index.setup(engine)
     log_info("✅ Database initialized successfully")
+    open_fare_store()
+    await start_http_client()
+    log_info("✅ Upstream HTTP client pool ready")
+    await start_writers()
+    await start_link_resolver()
+    await metrics.start_metrics()
     log_info(f"Running in {'DEBUG' if settings.DEBUG else 'PRODUCTION'} mode")
     yield
     log_info("👋 Shutting down TripCompare API...")
+    await close_http_client()
+    await metrics.stop_metrics()
+    await stop_link_resolver()
+    await stop_writers()
+    close_fare_store()
+    await async_engine.dispose()
+    stop_logging()
 
 
 # Create FastAPI application
@@ -64,7 +93,8 @@ A powerful API-first travel booking platform for affiliate marketing.
     version=settings.APP_VERSION,
     docs_url="/docs",
     redoc_url="/redoc",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=timing.TimedJSONResponse
 )
 
 # CORS middleware
@@ -74,6 +104,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, timing.SERVER_TIMING_HEADER],  # Let browser clients read the page cursor and timings
 )
 
 
@@ -81,11 +112,26 @@ app.add_middleware(
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     start_time = time.time()
+    spans = timing.start()
+    deadline.start(deadline.parse_header(request.headers.get(deadline.DEADLINE_HEADER)))
 
+    metrics.http_requests_in_flight.inc()
+    status_code = 500
     try:
         response = await call_next(request)
+        status_code = response.status_code
         process_time = (time.time() - start_time) * 1000  # Convert to milliseconds
         response.headers["X-Process-Time"] = f"{round(process_time, 2)}ms"
+        if settings.SERVER_TIMING_ENABLED:
+            response.headers[timing.SERVER_TIMING_HEADER] = spans.header()
+        if process_time >= settings.SLOW_REQUEST_MS:
+            log_slow_request(
+                endpoint=request.url.path,
+                method=request.method,
+                status_code=response.status_code,
+                duration_ms=process_time,
+                breakdown=spans.summary()
+            )
 
         # Log the API call
         log_api_call(
@@ -100,6 +146,16 @@ async def add_process_time_header(request: Request, call_next):
         process_time = (time.time() - start_time) * 1000
         log_error(e, context=f"{request.method} {request.url.path}")
         raise
+    finally:
+        metrics.http_requests_in_flight.dec()
+        # Route template, not the raw path, to keep the number of series bounded
+        route = request.scope.get("route")
+        metrics.observe_request(
+            route.path if route is not None else metrics.UNMATCHED_ROUTE,
+            request.method,
+            status_code,
+            time.time() - start_time
+        )
 
 
 # Include routers
@@ -109,6 +165,7 @@ app.include_router(deals_router)
 app.include_router(experiences_router)
 app.include_router(search_router)
 app.include_router(analytics_router)
+app.include_router(admin_router)
 
 
 # Root endpoint
@@ -133,6 +190,15 @@ def root():
     }
 
 
+@app.get("/metrics", tags=["Health"])
+def prometheus_metrics():
+    """
+    Prometheus metrics (text exposition format), summed over all workers
+    when METRICS_DIR is set.
+    """
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/health", tags=["Health"])
 def health_check():
     """
@@ -141,10 +207,32 @@ def health_check():
     return {
         "status": "healthy",
         "database": "connected",
-        "version": settings.APP_VERSION
+        "version": settings.APP_VERSION,
+        "cache": response_cache.stats(),
+        "fare_store": fare_store.stats() if fare_store else {"enabled": False},
+        "coalescing": upstream_flights.stats(),
+        "circuit_breakers": breaker_stats(),
+        "rate_limits": rate_limit_stats(),
+        "ingest": ingest_stats(),
+        "logging": logging_stats(),
+        "deal_links": deal_links.stats()
     }
 
 
+# Request ran out of its deadline outside an endpoint's own error handling
+@app.exception_handler(deadline.DeadlineExceeded)
+async def deadline_exception_handler(request: Request, exc: deadline.DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": "Request deadline exceeded"})
+
+
+@app.exception_handler(OperationalError)
+async def database_exception_handler(request: Request, exc: OperationalError):
+    # SQLite reports statements aborted by the deadline check as "interrupted"
+    if deadline.expired() and "interrupted" in str(exc.orig):
+        return JSONResponse(status_code=504, content={"detail": "Request deadline exceeded"})
+    return await global_exception_handler(request, exc)
+
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -0,0 +1,421 @@
+"""
+Prometheus metrics
+
+Counters, gauges and histograms served in the Prometheus text format at
+/metrics:
+
+- request latency per route template, method and status, and requests in
+  flight (main.add_process_time_header)
+- upstream call latency and errors per provider (host) and endpoint (path)
+  (http_client._fetch)
+- database statement time per operation (engine events, database.py)
+- cache, fare store and deal link lookups by result, read from their
+  stats() at collection time; hit ratios are computed from these in
+  Prometheus
+
+Recording only looks up a pre-created series by its label values and
+updates its numbers under that series' own lock; nothing is formatted
+until /metrics is scraped. The per-request and per-statement hooks keep
+their series bound in plain dicts keyed by objects they already have
+(route template, method, status code, statement text), so in the steady
+state they build no label tuples or strings either.
+
+Each uvicorn worker has its own registry. With METRICS_DIR set, every
+worker writes a snapshot there every METRICS_FLUSH_SECONDS and /metrics
+sums all of them, so any worker answers for the whole server. Counters
+and histograms of exited workers are kept (totals never go backwards);
+their gauges are dropped. Clear the directory when redeploying.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .config import get_settings
+from .logger import log_warning
+
+settings = get_settings()
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+
+# ============== Series ==============
+
+class _Value:
+    """One counter or gauge series."""
+    __slots__ = ("value", "_lock")
+
+    def __init__(self, _buckets=None):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def dump(self) -> float:
+        return self.value
+
+
+class _Histogram:
+    """One histogram series: per-bucket counts (not cumulative) and sum."""
+    __slots__ = ("_bounds", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last one is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def dump(self) -> List[Any]:
+        with self._lock:
+            return [list(self.counts), self.sum]
+
+
+class Metric:
+    """A named metric; labels(*values) returns (creating once) one series."""
+
+    def __init__(
+            self,
+            kind: str,
+            name: str,
+            documentation: str,
+            labelnames: Tuple[str, ...] = (),
+            buckets: Optional[Tuple[float, ...]] = None
+    ):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        self._series_type = _Histogram if kind == HISTOGRAM else _Value
+
+    def labels(self, *values: str):
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.get(values)
+                if series is None:
+                    series = self._series[values] = self._series_type(self.buckets)
+        return series
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "buckets": list(self.buckets) if self.buckets else None,
+            "samples": [[list(labels), series.dump()] for labels, series in list(self._series.items())],
+        }
+
+
+_registry: Dict[str, Metric] = {}
+_collectors: List[Callable[[], None]] = []
+
+
+def _register(kind: str, name: str, documentation: str, labelnames=(), buckets=None) -> Metric:
+    metric = _registry[name] = Metric(kind, name, documentation, tuple(labelnames), buckets)
+    return metric
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Metric:
+    return _register(COUNTER, name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Metric:
+    return _register(GAUGE, name, documentation, labelnames)
+
+
+def histogram(
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+) -> Metric:
+    return _register(HISTOGRAM, name, documentation, labelnames, buckets)
+
+
+def add_collector(collect: Callable[[], None]) -> None:
+    """Register a function that sets series from other stats before each snapshot."""
+    _collectors.append(collect)
+
+
+# ============== Application metrics ==============
+
+http_requests_in_flight = gauge(
+    "tripcompare_http_requests_in_flight", "Requests currently being handled"
+).labels()
+http_request_duration = histogram(
+    "tripcompare_http_request_duration_seconds",
+    "Request latency by route template, method and status",
+    ("route", "method", "status"),
+)
+upstream_request_duration = histogram(
+    "tripcompare_upstream_request_duration_seconds",
+    "Upstream API call latency by provider and endpoint",
+    ("provider", "endpoint"),
+)
+upstream_errors = counter(
+    "tripcompare_upstream_errors_total",
+    "Failed upstream API calls by provider, endpoint and error",
+    ("provider", "endpoint", "error"),
+)
+db_query_duration = histogram(
+    "tripcompare_db_query_duration_seconds",
+    "Database statement time by operation",
+    ("operation",),
+    DB_BUCKETS,
+)
+cache_lookups = counter(
+    "tripcompare_cache_lookups_total",
+    "Cache lookups by cache and result",
+    ("cache", "result"),
+)
+
+UNMATCHED_ROUTE = "unmatched"
+
+_DB_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+# Statement texts whose series is remembered (SQLAlchemy reuses the same
+# strings for cached statements; beyond this they are classified per call)
+_MAX_BOUND_STATEMENTS = 2000
+
+# route -> method -> status code -> series
+_request_series: Dict[str, Dict[str, Dict[int, _Histogram]]] = {}
+# statement text -> series
+_query_series: Dict[str, _Histogram] = {}
+
+
+def _bind_request_series(route: str, method: str, status_code: int) -> _Histogram:
+    series = http_request_duration.labels(route, method, str(status_code))
+    _request_series.setdefault(route, {}).setdefault(method, {})[status_code] = series
+    return series
+
+
+def observe_request(route: str, method: str, status_code: int, seconds: float) -> None:
+    try:
+        series = _request_series[route][method][status_code]
+    except KeyError:
+        series = _bind_request_series(route, method, status_code)
+    series.observe(seconds)
+
+
+def observe_upstream(url, seconds: Optional[float], error: Optional[Exception] = None) -> None:
+    """
+    Record an upstream call to an httpx.URL. seconds is None for calls
+    rejected before reaching the upstream (open circuit).
+    """
+    if seconds is not None:
+        upstream_request_duration.labels(url.host, url.path).observe(seconds)
+    if error is not None:
+        response = getattr(error, "response", None)
+        kind = f"status_{response.status_code}" if response is not None else type(error).__name__
+        upstream_errors.labels(url.host, url.path, kind).inc()
+
+
+def _db_operation(statement: str) -> str:
+    head = statement.lstrip()[:6].upper()
+    return head if head in _DB_OPERATIONS else "OTHER"
+
+
+def observe_query(statement: str, seconds: float) -> None:
+    series = _query_series.get(statement)
+    if series is None:
+        series = db_query_duration.labels(_db_operation(statement))
+        if len(_query_series) < _MAX_BOUND_STATEMENTS:
+            _query_series[statement] = series
+    series.observe(seconds)
+
+
+def _collect_caches() -> None:
+    # Imported here: link_resolver imports database, which imports this module
+    from .cache import response_cache
+    from .fare_store import fare_store
+    from .link_resolver import deal_links
+
+    stats = response_cache.stats()
+    cache_lookups.labels("response", "hit").set(stats["hits"])
+    cache_lookups.labels("response", "stale").set(stats["stale_hits"])
+    cache_lookups.labels("response", "miss").set(stats["misses"])
+    if fare_store is not None:
+        cache_lookups.labels("fare_store", "hit").set(fare_store.hits)
+        cache_lookups.labels("fare_store", "miss").set(fare_store.misses)
+    cache_lookups.labels("deal_links", "hit").set(deal_links.hits)
+    cache_lookups.labels("deal_links", "miss").set(deal_links.misses)
+
+
+add_collector(_collect_caches)
+
+
+# ============== Exposition ==============
+
+def snapshot() -> Dict[str, Any]:
+    """This worker's metrics as plain data."""
+    for collect in _collectors:
+        try:
+            collect()
+        except Exception as e:
+            log_warning(f"Metrics collector failed: {e}")
+    return {name: metric.snapshot() for name, metric in list(_registry.items())}
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _worker_snapshots() -> List[Tuple[Dict[str, Any], bool]]:
+    """(snapshot, alive) for this worker (live) and, with METRICS_DIR, the others."""
+    snapshots = [(snapshot(), True)]
+    if not settings.METRICS_DIR:
+        return snapshots
+    own = os.getpid()
+    for path in Path(settings.METRICS_DIR).glob("worker_*.json"):
+        try:
+            pid = int(path.stem.split("_", 1)[1])
+            if pid == own:
+                continue
+            snapshots.append((json.loads(path.read_text()), _pid_alive(pid)))
+        except (ValueError, OSError) as e:
+            log_warning(f"Skipping metrics snapshot {path.name}: {e}")
+    return snapshots
+
+
+def _merge(snapshots: List[Tuple[Dict[str, Any], bool]]) -> Dict[str, Dict[str, Any]]:
+    merged: Dict[str, Dict[str, Any]] = {}
+    for metrics, alive in snapshots:
+        for name, data in metrics.items():
+            if data["kind"] == GAUGE and not alive:
+                continue
+            target = merged.setdefault(name, dict(data, samples={}))
+            for labels, value in data["samples"]:
+                key = tuple(labels)
+                current = target["samples"].get(key)
+                if current is None:
+                    target["samples"][key] = value if data["kind"] != HISTOGRAM else [list(value[0]), value[1]]
+                elif data["kind"] == HISTOGRAM:
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+                else:
+                    target["samples"][key] = current + value
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render() -> str:
+    """All workers' metrics in the Prometheus text exposition format."""
+    lines = []
+    for name, data in sorted(_merge(_worker_snapshots()).items()):
+        lines.append(f"# HELP {name} {data['help']}")
+        lines.append(f"# TYPE {name} {data['kind']}")
+        names = data["labelnames"]
+        for labels, value in sorted(data["samples"].items()):
+            if data["kind"] != HISTOGRAM:
+                lines.append(f"{name}{_labels(names, labels)} {_number(value)}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(data["buckets"] + ["+Inf"], counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == "+Inf" else f'le="{bound}"'
+                lines.append(f"{name}_bucket{_labels(names, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(names, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# ============== Multi-worker snapshots ==============
+
+_flush_task: Optional[asyncio.Task] = None
+
+
+def _snapshot_path() -> Path:
+    return Path(settings.METRICS_DIR) / f"worker_{os.getpid()}.json"
+
+
+def _write_snapshot() -> None:
+    """Atomically replace this worker's snapshot file."""
+    path = _snapshot_path()
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(snapshot()))
+    os.replace(tmp, path)
+
+
+async def _flush_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.METRICS_FLUSH_SECONDS)
+        try:
+            await asyncio.to_thread(_write_snapshot)
+        except Exception as e:
+            log_warning(f"Writing metrics snapshot failed: {e}")
+
+
+async def start_metrics() -> None:
+    """Start writing snapshots for other workers (main.lifespan, METRICS_DIR only)."""
+    global _flush_task
+    if not settings.METRICS_DIR:
+        return
+    Path(settings.METRICS_DIR).mkdir(parents=True, exist_ok=True)
+    _flush_task = asyncio.create_task(_flush_periodically())
+
+
+async def stop_metrics() -> None:
+    """Stop the snapshot task and write a final snapshot."""
+    global _flush_task
+    if _flush_task is None:
+        return
+    _flush_task.cancel()
+    try:
+        await _flush_task
+    except asyncio.CancelledError:
+        pass
+    _flush_task = None
+    try:
+        await asyncio.to_thread(_write_snapshot)
+    except Exception as e:
+        log_warning(f"Writing metrics snapshot failed: {e}")
@@ -1,7 +1,7 @@
 """
 SQLAlchemy database models
 """
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -73,6 +73,14 @@ class Deal(Base):
 
     destination = relationship("Destination", back_populates="deals")
 
+    # Access paths of crud.get_deals (filters + newest first) and get_deals_by_destination
+    __table_args__ = (
+        Index("ix_deals_active_created", "is_active", "created_at"),
+        Index("ix_deals_active_type_created", "is_active", "deal_type", "created_at"),
+        Index("ix_deals_active_featured_created", "is_active", "is_featured", "created_at"),
+        Index("ix_deals_destination_active", "destination_id", "is_active"),
+    )
+
 
 class Experience(Base):
     """Tours and activities"""
@@ -94,6 +102,13 @@ class Experience(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Access paths of crud.get_experiences (filters + best rated first)
+    __table_args__ = (
+        Index("ix_experiences_active_rating", "is_active", "rating"),
+        Index("ix_experiences_active_destination_rating", "is_active", "destination_id", "rating"),
+        Index("ix_experiences_active_category_rating", "is_active", "category", "rating"),
+    )
+
 
 class SearchLog(Base):
     """Track user searches for analytics"""
@@ -111,6 +126,12 @@ class SearchLog(Base):
     session_id = Column(String(100))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Join key of crud.get_top_destinations, and time-range scans
+    __table_args__ = (
+        Index("ix_search_logs_destination", "destination"),
+        Index("ix_search_logs_created", "created_at"),
+    )
+
 
 class ClickTracking(Base):
     """Track affiliate link clicks"""
@@ -127,6 +148,11 @@ class ClickTracking(Base):
     session_id = Column(String(100))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Covers count_clicks and get_clicks_by_provider (range on created_at)
+    __table_args__ = (
+        Index("ix_click_tracking_created_provider", "created_at", "affiliate_provider"),
+    )
+
 
 class PriceAlert(Base):
     """User price alerts"""
@@ -142,3 +168,57 @@ class PriceAlert(Base):
     is_active = Column(Boolean, default=True)
     last_notified = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# ============== Analytics rollups ==============
+# Event counts per hour and per day, maintained by crud as events are
+# written (see rollups.py). Missing dimension values are stored as "".
+
+class ClickRollup(Base):
+    """Clicks per time bucket, provider and link type"""
+    __tablename__ = "click_rollups"
+
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String(5), nullable=False)  # hour, day
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    affiliate_provider = Column(String(100), nullable=False, default="")
+    link_type = Column(String(50), nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", "affiliate_provider", "link_type",
+                         name="uq_click_rollups_bucket"),
+    )
+
+
+class SearchRollup(Base):
+    """Searches per time bucket, destination and search type"""
+    __tablename__ = "search_rollups"
+
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String(5), nullable=False)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    destination = Column(String(255), nullable=False, default="")
+    search_type = Column(String(50), nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", "destination", "search_type",
+                         name="uq_search_rollups_bucket"),
+        Index("ix_search_rollups_destination", "granularity", "destination"),
+    )
+
+
+class SignupRollup(Base):
+    """Newsletter signups per time bucket and source"""
+    __tablename__ = "signup_rollups"
+
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String(5), nullable=False)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    source = Column(String(100), nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", "source", name="uq_signup_rollups_bucket"),
+    )
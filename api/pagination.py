@@ -0,0 +1,83 @@
+"""
+Keyset (cursor) pagination helpers
+
+OFFSET pagination makes the database walk and discard every skipped row,
+so deep pages get linearly slower. List endpoints also accept an opaque
+`cursor` naming the last row of the previous page; the next page starts
+right after that row in (sort column, id) order, which an index can seek
+to directly. The cursor for the following page is returned in the
+X-Next-Cursor response header, so list response bodies are unchanged.
+"""
+import base64
+import json
+from typing import Optional, Sequence
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """The last row id a cursor points at; 400 if it is malformed."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))["id"]
+        if not isinstance(last_id, int):
+            raise ValueError(last_id)
+        return last_id
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+
+def after_row(model, column, last_id: int, descending: bool = True, nullable: bool = False):
+    """
+    Filter for rows that come after row `last_id` in (column, id) order.
+
+    The sort value is read from the referenced row inside the query, so it
+    is compared exactly as stored; check that the row still exists first
+    (require_anchor). nullable=True (descending order only) also accounts
+    for NULLs, placing them after every value; the query must order by
+    column.desc().nulls_last(), since Postgres sorts NULLs first in DESC.
+    """
+    if column is model.id:
+        return model.id < last_id if descending else model.id > last_id
+
+    ref = select(column).where(model.id == last_id).scalar_subquery()
+    if descending:
+        condition = tuple_(column, model.id) < tuple_(ref, last_id)
+    else:
+        condition = tuple_(column, model.id) > tuple_(ref, last_id)
+    if nullable:
+        condition = or_(condition, and_(column.is_(None), or_(ref.is_not(None), model.id < last_id)))
+    return condition
+
+
+def require_anchor(db: Session, model, last_id: int) -> None:
+    """
+    400 if the row a cursor points at no longer exists. after_row() reads
+    the sort value from that row, so without it the page would silently
+    come back empty; the client should start again from the first page.
+    """
+    if db.execute(select(model.id).where(model.id == last_id)).first() is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pagination cursor points at a deleted row; start again without a cursor"
+        )
+
+
+def set_next_cursor(response: Response, items: Sequence, limit: int) -> None:
+    """Add X-Next-Cursor when the page is full (more rows may follow)."""
+    if items and len(items) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(items[-1].id)
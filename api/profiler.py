@@ -0,0 +1,172 @@
+"""
+On-demand sampling profiler
+
+GET /admin/profile samples every thread's Python stack (the event loop
+running async endpoints, the threadpool running sync ones and database
+calls) from a background thread for a few seconds, then returns the
+samples as collapsed stacks (flamegraph.pl, speedscope import) or as a
+speedscope document. The sampler thread only exists while a profile is
+being taken, so there is no cost otherwise.
+
+Samples where a thread is idle (event loop waiting in select, threadpool
+workers waiting for work) are skipped unless include_idle is set.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+COLLAPSED = "collapsed"
+SPEEDSCOPE = "speedscope"
+FORMATS = (COLLAPSED, SPEEDSCOPE)
+
+# Leaf frames of threads waiting for work
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already being taken in this worker."""
+
+
+def _short_path(filename: str) -> str:
+    """Path from the package or site-packages root, for readable frames."""
+    parts = filename.replace(os.sep, "/").split("/")
+    for anchor in ("api", "site-packages"):
+        if anchor in parts:
+            index = len(parts) - 1 - parts[::-1].index(anchor)
+            return "/".join(parts[index + (anchor == "site-packages"):])
+    return parts[-1]
+
+
+class StackSampler:
+    """Samples all threads' stacks at a fixed interval."""
+
+    def __init__(self, interval: float, include_idle: bool = False, app_only: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.app_only = app_only
+        self.samples: Dict[str, Counter] = {}  # thread name -> Counter of stacks
+        self.sample_count = 0
+        self.duration = 0.0
+        self._labels: Dict[Any, Frame] = {}  # code object -> Frame
+
+    def _frame(self, code) -> Frame:
+        frame = self._labels.get(code)
+        if frame is None:
+            frame = self._labels[code] = (code.co_name, _short_path(code.co_filename), code.co_firstlineno)
+        return frame
+
+    def _sample(self, own_ident: int, names: Dict[int, str]) -> None:
+        for ident, top in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            if not self.include_idle and top.f_code.co_filename.endswith(_IDLE_FILES):
+                continue
+            stack = []
+            frame = top
+            while frame is not None:
+                stack.append(self._frame(frame.f_code))
+                frame = frame.f_back
+            if self.app_only and not any(file.startswith("api/") for _, file, _ in stack):
+                continue
+            stack.reverse()
+            name = names.get(ident) or f"thread-{ident}"
+            self.samples.setdefault(name, Counter())[tuple(stack)] += 1
+
+    def run(self, seconds: float) -> None:
+        """Sample for `seconds` (blocking; run it in a thread)."""
+        own_ident = threading.get_ident()
+        started = time.perf_counter()
+        deadline = started + seconds
+        next_sample = started
+        names: Dict[int, str] = {}
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if self.sample_count % 50 == 0:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self._sample(own_ident, names)
+            self.sample_count += 1
+            next_sample += self.interval
+            delay = next_sample - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_sample = time.perf_counter()  # Fell behind; don't burst
+        self.duration = time.perf_counter() - started
+
+    # ============== Output ==============
+
+    @staticmethod
+    def _label(frame: Frame) -> str:
+        name, file, line = frame
+        return f"{name} ({file}:{line})"
+
+    def collapsed(self) -> str:
+        """One 'thread;outer;...;inner count' line per distinct stack."""
+        lines = []
+        for thread, stacks in self.samples.items():
+            for stack, count in stacks.most_common():
+                frames = ";".join(self._label(frame).replace(";", ",") for frame in stack)
+                lines.append(f"{thread};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> Dict[str, Any]:
+        """A speedscope file: one sampled profile per thread, weights in ms."""
+        frames: List[Dict[str, Any]] = []
+        index: Dict[Frame, int] = {}
+        weight = self.duration / self.sample_count * 1000 if self.sample_count else 0.0
+        profiles = []
+        for thread, stacks in self.samples.items():
+            samples, weights = [], []
+            for stack, count in stacks.items():
+                ids = []
+                for frame in stack:
+                    if frame not in index:
+                        index[frame] = len(frames)
+                        frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                    ids.append(index[frame])
+                samples.append(ids)
+                weights.append(count * weight)
+            profiles.append({
+                "type": "sampled",
+                "name": thread,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"TripCompare worker {os.getpid()}",
+            "exporter": "tripcompare",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+_lock = threading.Lock()
+
+
+def profile(
+        seconds: float,
+        interval: float,
+        include_idle: bool = False,
+        app_only: bool = False
+) -> StackSampler:
+    """Take one profile; raises ProfilerBusy while another one is running."""
+    if not _lock.acquire(blocking=False):
+        raise ProfilerBusy()
+    try:
+        sampler = StackSampler(interval, include_idle, app_only)
+        sampler.run(seconds)
+        return sampler
+    finally:
+        _lock.release()
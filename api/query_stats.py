@@ -0,0 +1,178 @@
+"""
+Per-statement query statistics and slow-query plans
+
+Opt-in (QUERY_STATS_ENABLED). The statement timing hook in database.py
+hands every statement to query_stats.record(), which aggregates calls,
+total, max and p99 time per normalized SQL text (whitespace collapsed,
+IN lists and multi-row VALUES folded). Executions slower than
+QUERY_SLOW_MS are logged, and the first one of each statement also
+captures its plan on the same connection:
+
+- SQLite: EXPLAIN QUERY PLAN
+- Postgres: EXPLAIN ANALYZE for SELECTs, which runs the query once more,
+  and plain EXPLAIN for writes
+
+Served by GET /admin/queries. Each worker keeps its own numbers.
+"""
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+from .config import get_settings
+from .logger import log_warning
+
+settings = get_settings()
+
+ORDER_KEYS = ("total", "p99", "max", "calls", "mean")
+
+# Durations kept per statement for the p99
+_SAMPLES = 512
+
+# Statement types (first keyword) that can be explained
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+# Bucket for statements beyond QUERY_STATS_MAX_STATEMENTS
+_OTHER = "<other statements>"
+
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)"
+_IN_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)")
+_VALUES_ROWS = re.compile(r"(VALUES\s*\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.IGNORECASE)
+
+
+def normalize(statement: str) -> str:
+    """SQL text with formatting and per-call list lengths removed."""
+    sql = _WHITESPACE.sub(" ", statement).strip()
+    sql = _VALUES_ROWS.sub(r"\1, ...", sql)
+    return _IN_LIST.sub("(...)", sql)
+
+
+class _Statement:
+    __slots__ = ("sql", "calls", "total", "max", "samples", "slow", "plan")
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: List[float] = []
+        self.slow = 0
+        self.plan: Optional[List[str]] = None
+
+    def add(self, seconds: float) -> None:
+        if len(self.samples) < _SAMPLES:
+            self.samples.append(seconds)
+        else:
+            self.samples[self.calls % _SAMPLES] = seconds
+        self.calls += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def p99(self) -> float:
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] if ordered else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sql": self.sql,
+            "calls": self.calls,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.calls * 1000, 3) if self.calls else 0.0,
+            "p99_ms": round(self.p99() * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "slow_calls": self.slow,
+            "plan": self.plan,
+        }
+
+
+class QueryStats:
+    """Statement statistics for one worker."""
+
+    def __init__(self, slow_ms: float, max_statements: int):
+        self.slow_seconds = slow_ms / 1000
+        self.max_statements = max_statements
+        self._statements: Dict[str, _Statement] = {}
+        self._normalized: Dict[str, str] = {}  # Raw statement -> normalized SQL
+        self._lock = threading.Lock()
+
+    def _entry(self, statement: str) -> _Statement:
+        sql = self._normalized.get(statement)
+        if sql is None:
+            sql = normalize(statement)
+            if len(self._normalized) < self.max_statements * 4:
+                self._normalized[statement] = sql
+        entry = self._statements.get(sql)
+        if entry is None:
+            if len(self._statements) >= self.max_statements:
+                sql = _OTHER
+            entry = self._statements.get(sql)
+            if entry is None:
+                entry = self._statements[sql] = _Statement(sql)
+        return entry
+
+    def record(self, conn, statement: str, parameters, executemany: bool, seconds: float) -> None:
+        """Add one execution (called from the after_cursor_execute hook)."""
+        with self._lock:
+            entry = self._entry(statement)
+            entry.add(seconds)
+            slow = seconds >= self.slow_seconds
+            capture = slow and entry.plan is None and not executemany and entry.sql != _OTHER
+            if slow:
+                entry.slow += 1
+            if capture:
+                entry.plan = []  # Claimed; filled in below outside the lock
+        if not slow:
+            return
+        log_warning(f"Slow query | {seconds * 1000:.2f}ms | {entry.sql[:500]}")
+        if capture:
+            entry.plan = _explain(conn, statement, parameters)
+
+    def top(self, limit: int = 20, order_by: str = "total") -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = [entry.to_dict() for entry in self._statements.values()]
+        key = f"{order_by}_ms" if order_by != "calls" else "calls"
+        return sorted(rows, key=lambda row: row[key], reverse=True)[:limit]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statements.clear()
+            self._normalized.clear()
+
+
+def _explain(conn, statement: str, parameters) -> List[str]:
+    """The statement's plan, run on the connection that executed it."""
+    dialect = conn.dialect.name
+    operation = statement.split(None, 1)[0].upper() if statement.strip() else ""
+    if operation not in _EXPLAINABLE:
+        return [f"No plan for {operation} statements"]
+    if dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    elif dialect == "postgresql":
+        prefix = "EXPLAIN ANALYZE " if operation in ("SELECT", "WITH") else "EXPLAIN "
+    else:
+        return [f"EXPLAIN not supported for {dialect}"]
+    try:
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    except Exception as e:
+        return [f"EXPLAIN failed: {type(e).__name__}: {e}"]
+    if dialect == "postgresql":
+        return [row[0] for row in rows]
+    # SQLite rows are (id, parent, notused, detail); indent children
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+query_stats = (
+    QueryStats(settings.QUERY_SLOW_MS, settings.QUERY_STATS_MAX_STATEMENTS)
+    if settings.QUERY_STATS_ENABLED else None
+)
@@ -0,0 +1,205 @@
+"""
+Outbound rate limiting for the shared Travelpayouts token
+
+All traffic shares one TRAVELPAYOUTS_TOKEN, and going over the partner's
+quota turns into 429s for users. Each upstream API family gets a token
+bucket; callers that find it empty wait in a priority queue, so
+interactive searches are served before background cache refreshes.
+Waiting is bounded: past max_wait (or when the queue is full)
+RateLimitExceeded is raised instead.
+"""
+import asyncio
+import heapq
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from .config import get_settings
+
+settings = get_settings()
+
+# Request priorities (lower is served first)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+_priority: ContextVar[int] = ContextVar("upstream_priority", default=PRIORITY_INTERACTIVE)
+
+
+class RateLimitExceeded(httpx.RequestError):
+    """No token became available within the allowed wait."""
+
+
+def set_priority(priority: int) -> None:
+    """Set the priority of upstream calls made from the current context."""
+    _priority.set(priority)
+
+
+def get_priority() -> int:
+    return _priority.get()
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second, up to `capacity`.
+
+    Only used from the event loop. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float, max_queue: int = 100):
+        self.name = name
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.max_queue = max_queue
+
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = 0
+        self._wakeup = None
+
+        self.acquired = 0
+        self.rejected = 0
+        self.queued = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE, max_wait: float = 5.0) -> None:
+        """Take one token, waiting up to max_wait seconds in priority order."""
+        if self.rate <= 0:
+            return
+
+        self._refill()
+        now = time.monotonic()
+        if not self.queue_depth() and self._tokens >= 1 and now >= self._paused_until:
+            self._tokens -= 1
+            self.acquired += 1
+            return
+
+        if self.queue_depth() >= self.max_queue:
+            self.rejected += 1
+            raise RateLimitExceeded(f"Rate limit queue full for {self.name}")
+
+        future = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        heapq.heappush(self._waiters, (priority, self._seq, future))
+        self.queued += 1
+        self._schedule()
+
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(future, max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise RateLimitExceeded(f"Rate limit wait exceeded for {self.name}")
+        finally:
+            waited = time.monotonic() - started
+            self.total_wait += waited
+            self.max_wait_seen = max(self.max_wait_seen, waited)
+
+        self.acquired += 1
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for a while (e.g. after an upstream 429)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = min(self._tokens, 0)
+
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate_per_second": self.rate,
+            "tokens": round(self._tokens, 2),
+            "queue_depth": self.queue_depth(),
+            "acquired": self.acquired,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / self.queued * 1000, 2) if self.queued else 0.0,
+            "max_wait_ms": round(self.max_wait_seen * 1000, 2),
+        }
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _schedule(self) -> None:
+        """Arrange a wake-up for when the next token will be available."""
+        if self._wakeup is not None:
+            return
+        now = time.monotonic()
+        delay = max((1 - self._tokens) / self.rate, self._paused_until - now, 0)
+        self._wakeup = asyncio.get_running_loop().call_later(delay, self._grant)
+
+    def _grant(self) -> None:
+        """Hand available tokens to waiters, highest priority first."""
+        self._wakeup = None
+        self._refill()
+        if time.monotonic() < self._paused_until:
+            self._schedule()
+            return
+
+        while self._waiters and self._tokens >= 1:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():  # Waiter timed out or was cancelled
+                continue
+            self._tokens -= 1
+            future.set_result(None)
+
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        if self._waiters:
+            self._schedule()
+
+
+# API families sharing the token, and their buckets
+FAMILY_V1_PRICES = "travelpayouts_v1"
+FAMILY_V3_AVIASALES = "aviasales_v3"
+FAMILY_HOTELLOOK = "hotellook"
+
+_buckets = {
+    FAMILY_V1_PRICES: TokenBucket(
+        FAMILY_V1_PRICES,
+        settings.OUTBOUND_RATE_V1_PER_SECOND,
+        settings.OUTBOUND_RATE_BURST,
+        settings.OUTBOUND_RATE_MAX_QUEUE,
+    ),
+    FAMILY_V3_AVIASALES: TokenBucket(
+        FAMILY_V3_AVIASALES,
+        settings.OUTBOUND_RATE_V3_PER_SECOND,
+        settings.OUTBOUND_RATE_BURST,
+        settings.OUTBOUND_RATE_MAX_QUEUE,
+    ),
+    FAMILY_HOTELLOOK: TokenBucket(
+        FAMILY_HOTELLOOK,
+        settings.OUTBOUND_RATE_HOTELLOOK_PER_SECOND,
+        settings.OUTBOUND_RATE_BURST,
+        settings.OUTBOUND_RATE_MAX_QUEUE,
+    ),
+}
+
+
+def bucket_for(url: httpx.URL):
+    """The bucket for an upstream URL, or None if it is not rate limited."""
+    if url.host == "engine.hotellook.com":
+        return _buckets[FAMILY_HOTELLOOK]
+    if url.host == "api.travelpayouts.com":
+        if url.path.startswith("/aviasales/v3"):
+            return _buckets[FAMILY_V3_AVIASALES]
+        return _buckets[FAMILY_V1_PRICES]
+    return None
+
+
+async def acquire_for(url: httpx.URL) -> None:
+    """Wait for a token for this URL's API family at the current priority."""
+    bucket = bucket_for(url)
+    if bucket is not None:
+        await bucket.acquire(get_priority(), settings.OUTBOUND_RATE_MAX_WAIT_SECONDS)
+
+
+def rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    """Queue depth and wait metrics per API family, for /health."""
+    return {name: bucket.stats() for name, bucket in _buckets.items()}
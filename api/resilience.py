@@ -0,0 +1,196 @@
+"""
+Circuit breakers and hedged requests for upstream APIs
+
+When api.travelpayouts.com or engine.hotellook.com degrades, waiting out the
+full timeout on every request ties up workers for nothing. Each upstream
+host gets a CircuitBreaker that watches the error rate (slow calls count as
+errors) over a rolling window:
+
+- closed: calls go through and outcomes are recorded
+- open: calls fail fast with CircuitOpenError until open_seconds pass
+- half-open: a single probe call decides between closed and open again
+
+hedged() optionally fires a duplicate request when the first one is slower
+than the host's recent p95 latency and returns whichever finishes first.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+
+from .config import get_settings
+from .logger import log_warning, log_info
+from .ratelimit import RateLimitExceeded
+
+settings = get_settings()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(httpx.RequestError):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Error-rate and latency driven circuit breaker for one upstream host."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        window: int = 20,
+        min_calls: int = 10,
+        slow_call_seconds: float = 10.0,
+        open_seconds: float = 30.0,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+
+        self.state = CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)  # True = failure
+        self._latencies: Deque[float] = deque(maxlen=100)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow_request(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now."""
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit open for {self.name}")
+            self.state = HALF_OPEN
+            self._probe_in_flight = False
+
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit half-open for {self.name}, probe in flight")
+            self._probe_in_flight = True
+
+    def record(self, failed: bool, duration: float) -> None:
+        """Record the outcome of a call admitted by allow_request."""
+        failed = failed or duration >= self.slow_call_seconds
+        if not failed:
+            self._latencies.append(duration)
+
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+            if failed:
+                self._open()
+            else:
+                self.state = CLOSED
+                self._outcomes.clear()
+                log_info(f"Circuit closed for {self.name}")
+            return
+
+        self._outcomes.append(failed)
+        if len(self._outcomes) >= self.min_calls:
+            failures = sum(self._outcomes)
+            if failures / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    def release(self) -> None:
+        """Give back a half-open probe slot when the call was cancelled."""
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+
+    def p95_latency(self) -> Optional[float]:
+        """95th percentile of recent successful call durations (seconds)."""
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def stats(self) -> Dict[str, Any]:
+        failures = sum(self._outcomes)
+        p95 = self.p95_latency()
+        return {
+            "state": self.state,
+            "recent_calls": len(self._outcomes),
+            "recent_failures": failures,
+            "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.times_opened += 1
+        log_warning(f"Circuit opened for {self.name}")
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    """Get (or create) the breaker for an upstream host."""
+    breaker = _breakers.get(host)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            host,
+            failure_rate=settings.BREAKER_FAILURE_RATE,
+            window=settings.BREAKER_WINDOW,
+            min_calls=settings.BREAKER_MIN_CALLS,
+            slow_call_seconds=settings.BREAKER_SLOW_CALL_SECONDS,
+            open_seconds=settings.BREAKER_OPEN_SECONDS,
+        )
+        _breakers[host] = breaker
+    return breaker
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """State of every upstream breaker, for /health."""
+    return {host: breaker.stats() for host, breaker in _breakers.items()}
+
+
+def is_failure(error: BaseException) -> bool:
+    """Whether an upstream error should count against the breaker."""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    if isinstance(error, RateLimitExceeded):
+        return False  # Rejected by our own outbound limiter
+    return isinstance(error, httpx.RequestError)
+
+
+async def hedged(call: Callable[[], Awaitable[Any]], delay: Optional[float]) -> Any:
+    """
+    Run call(); if it has not finished after delay seconds, start a second
+    attempt and return whichever succeeds first.
+
+    With delay None the call runs once. If both attempts fail, the error
+    of the first one is raised.
+    """
+    if delay is None:
+        return await call()
+
+    first = asyncio.ensure_future(call())
+    pending = {first}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return first.result()
+
+        pending.add(asyncio.ensure_future(call()))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        return first.result()
+    finally:
+        # Also reached when the caller is cancelled (deadline, disconnect)
+        for task in pending:
+            task.cancel()
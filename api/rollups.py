@@ -0,0 +1,294 @@
+"""
+Hourly and daily analytics rollups
+
+Dashboard numbers used to be counted from the raw click_tracking,
+search_logs and subscribers tables on every hit. The rollup tables hold
+event counts per hour and per day, broken down by a few dimensions. crud
+updates them in the same transaction that writes the raw rows, so every
+bucket, including the current one, is exact.
+
+A time window is answered from daily buckets for whole days, hourly
+buckets for the remaining whole hours, and the raw table only for the
+partial hours at its edges.
+
+backfill() builds the tables from the raw rows once, when they are first
+created. It is a deploy step run before the workers start, so they do not
+race each other to rebuild the same tables:
+
+    python -m api.rollups            # backfill empty rollup tables
+    python -m api.rollups --rebuild  # recompute every rollup table
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from sqlalchemy import DateTime, String, delete, func, insert, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .logger import log_info
+from . import models
+
+HOUR = "hour"
+DAY = "day"
+GRANULARITIES = (HOUR, DAY)
+
+_STEP = {HOUR: timedelta(hours=1), DAY: timedelta(days=1)}
+
+
+class Metric(NamedTuple):
+    """A counted event: its rollup table, raw table and dimensions."""
+    rollup: Any
+    raw: Any
+    dimensions: Tuple[str, ...]  # Column names shared by rollup and raw table
+
+
+CLICKS = Metric(models.ClickRollup, models.ClickTracking, ("affiliate_provider", "link_type"))
+SEARCHES = Metric(models.SearchRollup, models.SearchLog, ("destination", "search_type"))
+SIGNUPS = Metric(models.SignupRollup, models.Subscriber, ("source",))
+
+METRICS = (CLICKS, SEARCHES, SIGNUPS)
+METRICS_BY_NAME = {"clicks": CLICKS, "searches": SEARCHES, "signups": SIGNUPS}
+
+
+# ============== Buckets ==============
+#
+# Buckets are computed on naive UTC datetimes (like datetime.utcnow()).
+# The timestamp columns are timezone-aware on Postgres, so values bound
+# there are made aware (UTC) by _bind_time; SQLite stores naive text.
+
+def _utc_naive(ts: datetime) -> datetime:
+    """ts as a naive UTC datetime (aware values are converted first)."""
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _bind_time(dialect_name: str, ts: datetime) -> datetime:
+    """A naive UTC datetime as the value to bind for the dialect."""
+    return ts if dialect_name == "sqlite" else ts.replace(tzinfo=timezone.utc)
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    """Start of the hour or day (UTC) containing ts."""
+    ts = _utc_naive(ts).replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0) if granularity == DAY else ts
+
+
+def _ceil(ts: datetime, granularity: str) -> datetime:
+    start = bucket_start(ts, granularity)
+    return start if start == _utc_naive(ts) else start + _STEP[granularity]
+
+
+def split_window(since: datetime, until: datetime) -> List[Tuple[Optional[str], datetime, datetime]]:
+    """
+    Cover [since, until) with (granularity, start, end) ranges: whole days,
+    then whole hours, and granularity None for partial hours (raw rows).
+    """
+    since, until = _utc_naive(since), _utc_naive(until)
+    hour_from, hour_to = _ceil(since, HOUR), bucket_start(until, HOUR)
+    if hour_from >= hour_to:
+        return [(None, since, until)] if since < until else []
+
+    ranges = []
+    if since < hour_from:
+        ranges.append((None, since, hour_from))
+    day_from, day_to = _ceil(hour_from, DAY), bucket_start(hour_to, DAY)
+    if day_from < day_to:
+        if hour_from < day_from:
+            ranges.append((HOUR, hour_from, day_from))
+        ranges.append((DAY, day_from, day_to))
+        if day_to < hour_to:
+            ranges.append((HOUR, day_to, hour_to))
+    else:
+        ranges.append((HOUR, hour_from, hour_to))
+    if hour_to < until:
+        ranges.append((None, hour_to, until))
+    return ranges
+
+
+# ============== Incremental maintenance ==============
+
+def rollup_rows(metric: Metric, records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Aggregate raw records (dicts with created_at) into rollup increments."""
+    counts = Counter()
+    for record in records:
+        dims = tuple(record.get(name) or "" for name in metric.dimensions)
+        for granularity in GRANULARITIES:
+            counts[(granularity, bucket_start(record["created_at"], granularity)) + dims] += 1
+    columns = ("granularity", "bucket_start") + metric.dimensions
+    return [dict(zip(columns, key), count=n) for key, n in counts.items()]
+
+
+def increment_statement(dialect_name: str, metric: Metric, records: Iterable[Dict[str, Any]]):
+    """Upsert adding the records' counts to their buckets (None if no records)."""
+    rows = rollup_rows(metric, records)
+    if not rows:
+        return None
+    for row in rows:
+        row["bucket_start"] = _bind_time(dialect_name, row["bucket_start"])
+    dialect_insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = dialect_insert(metric.rollup).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=["granularity", "bucket_start", *metric.dimensions],
+        set_={"count": metric.rollup.count + stmt.excluded.count},
+    )
+
+
+# ============== Reading ==============
+
+def _time_column(metric: Metric):
+    return metric.raw.created_at
+
+
+def _raw_bound(dialect_name: str, ts: datetime):
+    """
+    A window bound for raw timestamps, bound as an aware UTC DateTime.
+    SQLite stores them as text and compares them as such, and rows written
+    by server_default lack the fractional part that a bound datetime would
+    get, so there whole-second bounds are rendered without it.
+    """
+    if dialect_name == "sqlite":
+        return literal(ts.isoformat(sep=" "), String)
+    return literal(_bind_time(dialect_name, ts), DateTime(timezone=True))
+
+
+def count(
+        db: Session,
+        metric: Metric,
+        since: datetime,
+        until: Optional[datetime] = None,
+        by: Optional[str] = None
+) -> Union[int, Dict[Optional[str], int]]:
+    """
+    Events in [since, until) (until defaults to now), in total or per value
+    of the dimension `by`.
+    """
+    until = until or datetime.utcnow()
+    dialect_name = db.get_bind().dialect.name
+    totals: Counter = Counter()
+    for granularity, start, end in split_window(since, until):
+        if granularity is None:
+            column = _time_column(metric)
+            dim = getattr(metric.raw, by) if by else literal("")
+            query = select(dim, func.count()).where(
+                column >= _raw_bound(dialect_name, start), column < _raw_bound(dialect_name, end)
+            )
+        else:
+            table = metric.rollup
+            dim = getattr(table, by) if by else literal("")
+            query = select(dim, func.sum(table.count)).where(
+                table.granularity == granularity,
+                table.bucket_start >= _bind_time(dialect_name, start),
+                table.bucket_start < _bind_time(dialect_name, end),
+            )
+        if by:
+            query = query.group_by(dim)
+        for key, n in db.execute(query):
+            totals[key or None] += n or 0
+
+    if by is None:
+        return sum(totals.values())
+    return dict(totals)
+
+
+def series(
+        db: Session,
+        metric: Metric,
+        granularity: str,
+        since: datetime,
+        until: Optional[datetime] = None,
+        by: Optional[str] = None
+) -> Tuple[List[datetime], Dict[Optional[str], List[int]]]:
+    """
+    Counts per bucket from `since`'s bucket through `until`'s (now by
+    default), as (bucket starts, {dimension value: counts}) in one query.
+    Buckets without events are filled with 0.
+    """
+    step = _STEP[granularity]
+    first = bucket_start(since, granularity)
+    last = bucket_start(until or datetime.utcnow(), granularity)
+    starts = [first + i * step for i in range(int((last - first) / step) + 1)]
+
+    dialect_name = db.get_bind().dialect.name
+    table = metric.rollup
+    dim = getattr(table, by) if by else literal("")
+    rows = db.execute(
+        select(table.bucket_start, dim, func.sum(table.count)).where(
+            table.granularity == granularity,
+            table.bucket_start >= _bind_time(dialect_name, first),
+            table.bucket_start <= _bind_time(dialect_name, last),
+        ).group_by(table.bucket_start, dim)
+    )
+
+    points: Dict[Optional[str], List[int]] = {}
+    for start, key, n in rows:
+        values = points.setdefault(key or None, [0] * len(starts))
+        values[int((_utc_naive(start) - first) / step)] += n or 0
+    return starts, points
+
+
+# ============== Backfill ==============
+
+def _bucket_expression(dialect_name: str, column, granularity: str):
+    """SQL truncating a timestamp to its bucket, stored like Python datetimes."""
+    if dialect_name == "postgresql":
+        # Truncate in UTC, not in the session time zone
+        return func.timezone("UTC", func.date_trunc(granularity, func.timezone("UTC", column)))
+    fmt = "%Y-%m-%d %H:00:00.000000" if granularity == HOUR else "%Y-%m-%d 00:00:00.000000"
+    return func.strftime(fmt, column)
+
+
+def rebuild(db: Session, metric: Metric) -> None:
+    """Recompute a metric's rollup table from its raw table."""
+    dialect_name = db.get_bind().dialect.name
+    db.execute(delete(metric.rollup))
+    for granularity in GRANULARITIES:
+        bucket = _bucket_expression(dialect_name, _time_column(metric), granularity)
+        dims = [func.coalesce(getattr(metric.raw, name), "") for name in metric.dimensions]
+        source = select(literal(granularity), bucket, *dims, func.count()).where(
+            _time_column(metric).is_not(None)
+        ).group_by(bucket, *dims)
+        db.execute(insert(metric.rollup).from_select(
+            ["granularity", "bucket_start", *metric.dimensions, "count"], source
+        ))
+    db.commit()
+
+
+def backfill(db: Session) -> None:
+    """Build rollup tables that are still empty while their raw table is not."""
+    for metric in METRICS:
+        has_rollups = db.execute(select(metric.rollup.id).limit(1)).first()
+        has_raw = db.execute(select(metric.raw.id).limit(1)).first()
+        if has_raw and not has_rollups:
+            rebuild(db, metric)
+            log_info(f"Backfilled {metric.rollup.__tablename__} from {metric.raw.__tablename__}")
+
+
+def _main() -> None:
+    import argparse
+
+    from .database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(
+        prog="python -m api.rollups",
+        description="Build the analytics rollup tables from the raw tables."
+    )
+    parser.add_argument(
+        "--rebuild", action="store_true",
+        help="recompute every rollup table, not only the empty ones"
+    )
+    args = parser.parse_args()
+
+    init_db()
+    with SessionLocal() as db:
+        if args.rebuild:
+            for metric in METRICS:
+                rebuild(db, metric)
+                log_info(f"Rebuilt {metric.rollup.__tablename__} from {metric.raw.__tablename__}")
+        else:
+            backfill(db)
+
+
+if __name__ == "__main__":
+    _main()
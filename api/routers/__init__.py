@@ -7,6 +7,7 @@ from .deals import router as deals_router
 from .experiences import router as experiences_router
 from .search import router as search_router
 from .analytics import router as analytics_router
+from .admin import router as admin_router
 
 __all__ = [
     "subscribers_router",
@@ -14,5 +15,6 @@ __all__ = [
     "deals_router",
     "experiences_router",
     "search_router",
-    "analytics_router"
+    "analytics_router",
+    "admin_router"
 ]
@@ -0,0 +1,108 @@
+"""
+Admin API endpoints (diagnostics)
+
+Every endpoint requires the X-Admin-Token header to match ADMIN_TOKEN.
+Without an ADMIN_TOKEN they are only available in DEBUG mode.
+"""
+import asyncio
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from ..config import get_settings
+from ..profiler import COLLAPSED, FORMATS, ProfilerBusy, profile
+from ..query_stats import ORDER_KEYS, query_stats
+from ..timing import TimedRoute
+
+settings = get_settings()
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None, alias=ADMIN_TOKEN_HEADER)) -> None:
+    """Allow the request if it carries the admin token (or, without one configured, in DEBUG)."""
+    if settings.ADMIN_TOKEN:
+        if x_admin_token and secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+            return
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
+    if not settings.DEBUG:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Admin endpoints need ADMIN_TOKEN outside DEBUG mode"
+        )
+
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    route_class=TimedRoute,
+    dependencies=[Depends(require_admin)]
+)
+
+
+# ============== Query statistics ==============
+
+@router.get("/queries")
+def get_query_stats(
+        limit: int = Query(20, ge=1, le=500),
+        order_by: str = Query("total", description="total, p99, max, calls or mean")
+):
+    """
+    Slowest SQL statements of this worker, with the plans captured for
+    executions over QUERY_SLOW_MS. Requires QUERY_STATS_ENABLED.
+    """
+    if order_by not in ORDER_KEYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"order_by must be one of: {', '.join(ORDER_KEYS)}"
+        )
+    if query_stats is None:
+        return {"enabled": False, "statements": []}
+    return {
+        "enabled": True,
+        "slow_ms": settings.QUERY_SLOW_MS,
+        "order_by": order_by,
+        "statements": query_stats.top(limit, order_by)
+    }
+
+
+@router.delete("/queries", status_code=status.HTTP_204_NO_CONTENT)
+def reset_query_stats():
+    """Clear the statement statistics and captured plans."""
+    if query_stats is not None:
+        query_stats.reset()
+
+
+# ============== Profiling ==============
+
+@router.get("/profile")
+async def profile_worker(
+        seconds: float = Query(10, gt=0, le=60),
+        interval_ms: float = Query(5, ge=1, le=100),
+        format: str = Query(COLLAPSED, description="collapsed or speedscope"),
+        include_idle: bool = False,
+        app_only: bool = Query(False, description="Only stacks passing through api/ code")
+):
+    """
+    Sample this worker's Python stacks for `seconds` and return them as
+    collapsed stacks (text) or a speedscope file (open at speedscope.app).
+    Only the worker that receives the request is profiled.
+    """
+    if format not in FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"format must be one of: {', '.join(FORMATS)}"
+        )
+    try:
+        sampler = await asyncio.to_thread(profile, seconds, interval_ms / 1000, include_idle, app_only)
+    except ProfilerBusy:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running")
+
+    if format == COLLAPSED:
+        return PlainTextResponse(sampler.collapsed())
+    return JSONResponse(
+        sampler.speedscope(),
+        headers={"Content-Disposition": 'attachment; filename="profile.speedscope.json"'}
+    )
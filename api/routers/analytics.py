@@ -1,14 +1,16 @@
 """
 Analytics API endpoints
 """
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import Optional
+from datetime import datetime, timedelta
 
 from ..database import get_db
-from .. import crud, schemas
+from ..timing import TimedRoute
+from .. import crud, rollups, schemas
 
-router = APIRouter(prefix="/analytics", tags=["Analytics"])
+router = APIRouter(prefix="/analytics", tags=["Analytics"], route_class=TimedRoute)
 
 
 @router.get("/dashboard", response_model=schemas.AnalyticsResponse)
@@ -56,6 +58,59 @@ def get_click_analytics(
     }
 
 
+@router.get("/timeseries", response_model=schemas.TimeSeriesResponse)
+def get_timeseries(
+        metric: str = Query("clicks", pattern="^(clicks|searches|signups)$"),
+        bucket: str = Query("day", pattern="^(hour|day)$"),
+        days: int = Query(30, ge=1, le=365),
+        group_by: Optional[str] = Query(
+            None, description="clicks: affiliate_provider, link_type; "
+                              "searches: destination, search_type; signups: source"
+        ),
+        top: int = Query(10, ge=1, le=50, description="Series kept; the rest are summed as 'other'"),
+        db: Session = Depends(get_db)
+):
+    """
+    Event counts per hour or day, optionally one series per dimension value.
+
+    Served from the rollup tables; buckets without events are 0. The first
+    bucket is the one containing now - days, the last is the current one.
+
+    Example: /analytics/timeseries?metric=clicks&bucket=day&days=90&group_by=affiliate_provider
+    """
+    source = rollups.METRICS_BY_NAME[metric]
+    if group_by is not None and group_by not in source.dimensions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"group_by for {metric} must be one of: {', '.join(source.dimensions)}"
+        )
+    if bucket == rollups.HOUR and days > 31:
+        raise HTTPException(status_code=400, detail="Hourly buckets are limited to 31 days")
+
+    since = datetime.utcnow() - timedelta(days=days)
+    buckets, points = rollups.series(db, source, bucket, since, by=group_by)
+
+    ranked = sorted(points.items(), key=lambda item: sum(item[1]), reverse=True)
+    series = [
+        schemas.TimeSeries(name=name, total=sum(values), points=values)
+        for name, values in ranked[:top]
+    ]
+    if len(ranked) > top:
+        other = [sum(column) for column in zip(*(values for _, values in ranked[top:]))]
+        series.append(schemas.TimeSeries(name="other", total=sum(other), points=other))
+    if not series:
+        series = [schemas.TimeSeries(name=None, total=0, points=[0] * len(buckets))]
+
+    return schemas.TimeSeriesResponse(
+        metric=metric,
+        bucket=bucket,
+        group_by=group_by,
+        buckets=buckets,
+        series=series,
+        total=sum(s.total for s in series)
+    )
+
+
 @router.get("/subscribers")
 def get_subscriber_analytics(db: Session = Depends(get_db)):
     """
@@ -1,14 +1,18 @@
 """
 Deals API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from ..database import get_db
+from ..timing import TimedRoute
+from ..ingest import click_writer
+from ..link_resolver import DealLink, deal_links
+from ..pagination import decode_cursor, set_next_cursor
 from .. import crud, schemas
 
-router = APIRouter(prefix="/deals", tags=["Deals"])
+router = APIRouter(prefix="/deals", tags=["Deals"], route_class=TimedRoute)
 
 
 @router.post("/", response_model=schemas.DealResponse, status_code=status.HTTP_201_CREATED)
@@ -28,27 +32,33 @@ def create_deal(deal: schemas.DealCreate, db: Session = Depends(get_db)):
 
 @router.get("/", response_model=List[schemas.DealResponse])
 def list_deals(
+        response: Response,
         skip: int = 0,
         limit: int = 20,
         deal_type: Optional[str] = Query(None, pattern="^(flight|hotel|package|experience)$"),
         featured_only: bool = False,
+        cursor: Optional[str] = None,
         db: Session = Depends(get_db)
 ):
     """
-    List all active deals.
+    List all active deals, newest first.
 
     - **skip**: Pagination offset
     - **limit**: Maximum results
     - **deal_type**: Filter by type (flight, hotel, package, experience)
     - **featured_only**: Only featured deals
+    - **cursor**: Continue after the previous page (from its X-Next-Cursor header)
     """
-    return crud.get_deals(
+    deals = crud.get_deals(
         db,
         skip=skip,
         limit=limit,
         deal_type=deal_type,
-        featured_only=featured_only
+        featured_only=featured_only,
+        after_id=decode_cursor(cursor)
     )
+    set_next_cursor(response, deals, limit)
+    return deals
 
 
 @router.get("/featured", response_model=List[schemas.DealResponse])
@@ -123,35 +133,15 @@ def update_deal(deal_id: int, deal: schemas.DealUpdate, db: Session = Depends(ge
 
 
 @router.post("/{deal_id}/click", response_model=schemas.MessageResponse)
-def track_deal_click(
-        deal_id: int,
-        request: Request,
-        db: Session = Depends(get_db)
-):
+async def track_deal_click(deal_id: int, request: Request):
     """
     Track a click on a deal (for analytics).
     Returns the affiliate link to redirect to.
     """
-    deal = crud.get_deal(db, deal_id)
-    if not deal:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Deal not found"
-        )
+    link = await _deal_link(deal_id)
 
-    # Track the click
-    crud.increment_deal_clicks(db, deal_id)
-    crud.create_click_tracking(
-        db,
-        deal_id=deal_id,
-        experience_id=None,
-        link_type="deal",
-        affiliate_provider=deal.affiliate_provider or "unknown",
-        ip_address=request.client.host if request.client else None,
-        user_agent=request.headers.get("user-agent"),
-        referrer=request.headers.get("referer"),
-        session_id=request.cookies.get("session_id")
-    )
+    # Track the click (row and click_count are written in batches)
+    await click_writer.submit(_click_record(deal_id, link.provider, request))
 
     return {
         "message": "Click tracked",
@@ -160,29 +150,38 @@ def track_deal_click(
 
 
 @router.get("/{deal_id}/redirect")
-def redirect_to_deal(deal_id: int, request: Request, db: Session = Depends(get_db)):
+async def redirect_to_deal(deal_id: int, request: Request):
     """
     Track click and return affiliate link for redirect.
+
+    Served from the in-memory link map, without a database query.
     """
-    deal = crud.get_deal(db, deal_id)
-    if not deal:
+    link = await _deal_link(deal_id)
+
+    # Track click
+    await click_writer.submit(_click_record(deal_id, link.provider, request))
+
+    return {"affiliate_link": link.link or "#"}
+
+
+async def _deal_link(deal_id: int) -> DealLink:
+    link = await deal_links.resolve(deal_id)
+    if link is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Deal not found"
         )
+    return link
 
-    # Track click
-    crud.increment_deal_clicks(db, deal_id)
-    crud.create_click_tracking(
-        db,
+
+def _click_record(deal_id: int, affiliate_provider: Optional[str], request: Request) -> dict:
+    return crud.click_tracking_record(
         deal_id=deal_id,
         experience_id=None,
         link_type="deal",
-        affiliate_provider=deal.affiliate_provider or "unknown",
+        affiliate_provider=affiliate_provider or "unknown",
         ip_address=request.client.host if request.client else None,
         user_agent=request.headers.get("user-agent"),
         referrer=request.headers.get("referer"),
         session_id=request.cookies.get("session_id")
     )
-
-    return {"affiliate_link": deal.affiliate_link or "#"}
@@ -1,14 +1,16 @@
 """
 Destinations API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from ..database import get_db
+from ..timing import TimedRoute
+from ..pagination import decode_cursor, set_next_cursor
 from .. import crud, schemas
 
-router = APIRouter(prefix="/destinations", tags=["Destinations"])
+router = APIRouter(prefix="/destinations", tags=["Destinations"], route_class=TimedRoute)
 
 
 @router.post("/", response_model=schemas.DestinationResponse, status_code=status.HTTP_201_CREATED)
@@ -28,9 +30,11 @@ def create_destination(destination: schemas.DestinationCreate, db: Session = Dep
 
 @router.get("/", response_model=List[schemas.DestinationResponse])
 def list_destinations(
+        response: Response,
         skip: int = 0,
         limit: int = 100,
         featured_only: bool = False,
+        cursor: Optional[str] = None,
         db: Session = Depends(get_db)
 ):
     """
@@ -39,8 +43,13 @@ def list_destinations(
     - **skip**: Number of records to skip (pagination)
     - **limit**: Maximum number of records to return
     - **featured_only**: Only return featured destinations
+    - **cursor**: Continue after the previous page (from its X-Next-Cursor header)
     """
-    return crud.get_destinations(db, skip=skip, limit=limit, featured_only=featured_only)
+    destinations = crud.get_destinations(
+        db, skip=skip, limit=limit, featured_only=featured_only, after_id=decode_cursor(cursor)
+    )
+    set_next_cursor(response, destinations, limit)
+    return destinations
 
 
 @router.get("/search", response_model=List[schemas.DestinationResponse])
@@ -1,14 +1,16 @@
 """
 Experiences/Tours API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from ..database import get_db
+from ..timing import TimedRoute
+from ..pagination import decode_cursor, set_next_cursor
 from .. import crud, schemas
 
-router = APIRouter(prefix="/experiences", tags=["Experiences"])
+router = APIRouter(prefix="/experiences", tags=["Experiences"], route_class=TimedRoute)
 
 
 @router.post("/", response_model=schemas.ExperienceResponse, status_code=status.HTTP_201_CREATED)
@@ -27,25 +29,31 @@ def create_experience(experience: schemas.ExperienceCreate, db: Session = Depend
 
 @router.get("/", response_model=List[schemas.ExperienceResponse])
 def list_experiences(
+        response: Response,
         skip: int = 0,
         limit: int = 20,
         destination_id: Optional[int] = None,
         category: Optional[str] = None,
+        cursor: Optional[str] = None,
         db: Session = Depends(get_db)
 ):
     """
-    List all experiences.
+    List all experiences, best rated first.
 
     - **destination_id**: Filter by destination
     - **category**: Filter by category (tours, food, adventure, culture)
+    - **cursor**: Continue after the previous page (from its X-Next-Cursor header)
     """
-    return crud.get_experiences(
+    experiences = crud.get_experiences(
         db,
         skip=skip,
         limit=limit,
         destination_id=destination_id,
-        category=category
+        category=category,
+        after_id=decode_cursor(cursor)
     )
+    set_next_cursor(response, experiences, limit)
+    return experiences
 
 
 @router.get("/categories", response_model=List[str])
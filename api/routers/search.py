@@ -4,20 +4,30 @@ Search API endpoints - Real Travelpayouts Integration
 Generates affiliate search URLs and fetches real flight/hotel data
 from Travelpayouts API using token: fa478c260b19fb84ecba1b41be11cde1
 """
-from fastapi import APIRouter, Depends, Request, Query, HTTPException
+from fastapi import APIRouter, Depends, Request, Response, Query, HTTPException
 from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any
 from datetime import date
 from urllib.parse import urlencode
+import asyncio
 import httpx
 
 from ..database import get_db
+from ..timing import TimedRoute
 from ..config import get_settings
-from .. import crud, schemas
+from ..deadline import DeadlineExceeded, budget
+from ..http_client import get_json, fetch_json
+from ..ingest import search_log_writer
+from ..streaming import stream_results
+from .. import crud, schemas, timing
 
-router = APIRouter(prefix="/search", tags=["Search"])
+router = APIRouter(prefix="/search", tags=["Search"], route_class=TimedRoute)
 settings = get_settings()
 
+# Per-endpoint deadlines (see api/deadline.py)
+search_budget = budget(settings.DEADLINE_SEARCH_SECONDS)
+autocomplete_budget = budget(settings.DEADLINE_AUTOCOMPLETE_SECONDS)
+
 
 # =============================================================================
 # TRAVELPAYOUTS API CONFIGURATION
@@ -45,8 +55,7 @@ HOTELLOOK_SEARCH = "https://search.hotellook.com"
 @router.post("/flights", response_model=schemas.SearchResponse)
 async def search_flights(
     search: schemas.FlightSearchRequest,
-    request: Request,
-    db: Session = Depends(get_db)
+    request: Request
 ):
     """
     Search flights and generate Travelpayouts/Aviasales affiliate link.
@@ -54,9 +63,8 @@ async def search_flights(
     Uses your Travelpayouts token to generate tracked booking links.
     When users book through these links, you earn commission!
     """
-    # Log the search for analytics
-    crud.create_search_log(
-        db,
+    # Log the search for analytics (written in batches in the background)
+    await search_log_writer.submit(crud.search_log_record(
         search_type="flight",
         origin=search.origin,
         destination=search.destination,
@@ -66,7 +74,7 @@ async def search_flights(
         ip_address=request.client.host if request.client else None,
         user_agent=request.headers.get("user-agent"),
         session_id=request.cookies.get("session_id")
-    )
+    ))
 
     # Generate Aviasales affiliate search URL
     origin = search.origin.upper()[:3]
@@ -103,7 +111,7 @@ async def search_flights(
     )
 
 
-@router.get("/flights/prices")
+@router.get("/flights/prices", dependencies=[search_budget])
 async def get_flight_prices(
     origin: str = Query(..., min_length=3, max_length=3, description="Origin IATA code (e.g., LON, PAR)"),
     destination: str = Query(..., min_length=3, max_length=3, description="Destination IATA code (e.g., BCN, ROM)"),
@@ -125,52 +133,73 @@ async def get_flight_prices(
             detail="Travelpayouts API not configured. Add TRAVELPAYOUTS_TOKEN to .env"
         )
 
-    # Build API request
-    endpoint = f"{FLIGHT_API_V1}/prices/direct" if direct else f"{FLIGHT_API_V1}/prices/cheap"
-
-    params = {
-        "origin": origin.upper(),
-        "destination": destination.upper(),
-        "currency": currency,
-        "token": TRAVELPAYOUTS_TOKEN,
-    }
-
-    if depart_date:
-        params["depart_date"] = depart_date
-    if return_date:
-        params["return_date"] = return_date
-
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(endpoint, params=params, timeout=30.0)
-            response.raise_for_status()
-            data = response.json()
-
-            # Add affiliate booking links to each result
-            if data.get("success") and data.get("data"):
-                enriched_data = {}
-                for dest_code, flights in data["data"].items():
-                    enriched_data[dest_code] = {}
-                    for key, flight in flights.items():
-                        flight["booking_link"] = _generate_flight_link(
-                            origin,
-                            dest_code,
-                            flight.get("departure_at", ""),
-                            flight.get("return_at", "")
-                        )
-                        enriched_data[dest_code][key] = flight
-                data["data"] = enriched_data
-
-            return data
+        return await _fetch_flight_prices(
+            origin, destination, depart_date, return_date, currency, direct
+        )
 
+    except DeadlineExceeded:
+        raise  # Handled app-wide as 504
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail=f"Travelpayouts API error: {e}")
     except httpx.RequestError as e:
         raise HTTPException(status_code=502, detail=f"Failed to connect to Travelpayouts: {e}")
 
 
-@router.get("/flights/calendar")
+@router.post("/flights/prices/batch", dependencies=[search_budget])
+async def get_flight_prices_batch(batch: schemas.FlightPriceBatchRequest):
+    """
+    Get cheapest prices for many routes in one call.
+
+    Send either one `origin` with a list of `destinations`, or a list of
+    `routes` ({origin, destination} pairs). Upstream calls run concurrently
+    and share the price cache; each route reports its own result or error.
+    Routes still pending when the request deadline expires are reported
+    with `timed_out: true` and the response is flagged `partial`.
+
+    Example body: {"origin": "LON", "destinations": ["BCN", "PAR", "ROM"]}
+    """
+    if not TRAVELPAYOUTS_TOKEN:
+        raise HTTPException(status_code=500, detail="Travelpayouts API not configured")
+
+    semaphore = asyncio.Semaphore(settings.SEARCH_BATCH_CONCURRENCY)
+    results = await asyncio.gather(*[
+        _flight_route_result(o, d, batch, semaphore) for o, d in batch.route_pairs()
+    ])
+
+    return {
+        "success": True,
+        "results": results,
+        "count": len(results),
+        "failed": sum(1 for r in results if not r["success"]),
+        "partial": any(r.get("timed_out") for r in results)
+    }
+
+
+@router.post("/flights/prices/batch/stream", dependencies=[search_budget])
+async def stream_flight_prices_batch(
+    batch: schemas.FlightPriceBatchRequest,
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="ndjson or sse"),
+):
+    """
+    Streaming version of /flights/prices/batch.
+
+    Emits one `result` event per route as soon as its prices arrive,
+    then a `summary` event. Use format=sse for EventSource clients.
+    """
+    if not TRAVELPAYOUTS_TOKEN:
+        raise HTTPException(status_code=500, detail="Travelpayouts API not configured")
+
+    semaphore = asyncio.Semaphore(settings.SEARCH_BATCH_CONCURRENCY)
+    return stream_results(
+        [_flight_route_result(o, d, batch, semaphore) for o, d in batch.route_pairs()],
+        fmt=format
+    )
+
+
+@router.get("/flights/calendar", dependencies=[search_budget])
 async def get_flight_calendar(
+    response: Response,
     origin: str = Query(..., min_length=3, max_length=3),
     destination: str = Query(..., min_length=3, max_length=3),
     depart_date: str = Query(..., description="Start date YYYY-MM-DD"),
@@ -179,7 +208,8 @@ async def get_flight_calendar(
     """
     Get flight prices for an entire month (calendar view).
 
-    Perfect for "cheapest day to fly" features.
+    Perfect for "cheapest day to fly" features. May serve slightly stale
+    data while refreshing it; see the X-Cache-Status header.
 
     Example: /search/flights/calendar?origin=LON&destination=BCN&depart_date=2025-06-01
     """
@@ -195,28 +225,33 @@ async def get_flight_calendar(
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{FLIGHT_API_V1}/prices/calendar",
-                params=params,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        data, cache_status = await fetch_json(
+            f"{FLIGHT_API_V1}/prices/calendar",
+            params=params,
+            cache_ttl=settings.CACHE_TTL_CALENDAR,
+            stale_while_revalidate=settings.CACHE_SWR_CALENDAR,
+            stale_if_error=settings.CACHE_STALE_IF_ERROR
+        )
+        response.headers["X-Cache-Status"] = cache_status
+        return data
 
+    except DeadlineExceeded:
+        raise  # Handled app-wide as 504
     except httpx.HTTPError as e:
         raise HTTPException(status_code=502, detail=f"Calendar API error: {str(e)}")
 
 
-@router.get("/flights/popular")
+@router.get("/flights/popular", dependencies=[search_budget])
 async def get_popular_destinations(
+    response: Response,
     origin: str = Query(..., min_length=3, max_length=3, description="Origin IATA code"),
     currency: str = Query("EUR"),
 ):
     """
     Get popular destinations from an origin city.
 
-    Great for "Where to fly from London?" features.
+    Great for "Where to fly from London?" features. May serve slightly
+    stale data while refreshing it; see the X-Cache-Status header.
 
     Example: /search/flights/popular?origin=LON
     """
@@ -230,45 +265,47 @@ async def get_popular_destinations(
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{FLIGHT_API_V1}/city-directions",
-                params=params,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            # Transform data for frontend consumption
-            destinations = []
-            if data.get("success") and data.get("data"):
-                for dest_code, info in data["data"].items():
-                    destinations.append({
-                        "origin": origin.upper(),
-                        "destination": dest_code,
-                        "price": info.get("price", 0),
-                        "transfers": info.get("transfers", 1),
-                        "airline": info.get("airline", None),
-                        "departure_at": info.get("departure_at", ""),
-                        "return_at": info.get("return_at", ""),
-                        "search_link": f"{AVIASALES_SEARCH}/{origin.upper()}{dest_code}1?marker={TRAVELPAYOUTS_MARKER}"
-                    })
-
-            # Sort by price
-            destinations.sort(key=lambda x: x.get("price", float('inf')))
-
-            return {
-                "success": True,
-                "origin": origin.upper(),
-                "destinations": destinations,
-                "count": len(destinations)
-            }
+        data, cache_status = await fetch_json(
+            f"{FLIGHT_API_V1}/city-directions",
+            params=params,
+            cache_ttl=settings.CACHE_TTL_POPULAR,
+            stale_while_revalidate=settings.CACHE_SWR_POPULAR,
+            stale_if_error=settings.CACHE_STALE_IF_ERROR
+        )
+        response.headers["X-Cache-Status"] = cache_status
+
+        # Transform data for frontend consumption
+        destinations = []
+        if data.get("success") and data.get("data"):
+            for dest_code, info in data["data"].items():
+                destinations.append({
+                    "origin": origin.upper(),
+                    "destination": dest_code,
+                    "price": info.get("price", 0),
+                    "transfers": info.get("transfers", 1),
+                    "airline": info.get("airline", None),
+                    "departure_at": info.get("departure_at", ""),
+                    "return_at": info.get("return_at", ""),
+                    "search_link": f"{AVIASALES_SEARCH}/{origin.upper()}{dest_code}1?marker={TRAVELPAYOUTS_MARKER}"
+                })
+
+        # Sort by price
+        destinations.sort(key=lambda x: x.get("price", float('inf')))
+
+        return {
+            "success": True,
+            "origin": origin.upper(),
+            "destinations": destinations,
+            "count": len(destinations)
+        }
 
+    except DeadlineExceeded:
+        raise  # Handled app-wide as 504
     except httpx.HTTPError as e:
         raise HTTPException(status_code=502, detail=f"Popular destinations API error: {str(e)}")
 
 
-@router.get("/flights/latest")
+@router.get("/flights/latest", dependencies=[search_budget])
 async def get_latest_prices(
     origin: str = Query(..., min_length=3, max_length=3),
     destination: str = Query(..., min_length=3, max_length=3),
@@ -294,27 +331,26 @@ async def get_latest_prices(
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{AVIASALES_API_V3}/prices_for_dates",
-                params=params,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            data = response.json()
+        data = await get_json(
+            f"{AVIASALES_API_V3}/prices_for_dates",
+            params=params,
+            cache_ttl=settings.CACHE_TTL_LATEST
+        )
 
-            # Add booking links
-            if data.get("success") and data.get("data"):
-                for flight in data["data"]:
-                    flight["booking_link"] = _generate_flight_link(
-                        flight.get("origin", origin),
-                        flight.get("destination", destination),
-                        flight.get("departure_at", ""),
-                        flight.get("return_at", "")
-                    )
+        # Add booking links
+        if data.get("success") and data.get("data"):
+            for flight in data["data"]:
+                flight["booking_link"] = _generate_flight_link(
+                    flight.get("origin", origin),
+                    flight.get("destination", destination),
+                    flight.get("departure_at", ""),
+                    flight.get("return_at", "")
+                )
 
-            return data
+        return data
 
+    except DeadlineExceeded:
+        raise  # Handled app-wide as 504
     except httpx.HTTPError as e:
         raise HTTPException(status_code=502, detail=f"Latest prices API error: {str(e)}")
 
@@ -326,17 +362,15 @@ async def get_latest_prices(
 @router.post("/hotels", response_model=schemas.SearchResponse)
 async def search_hotels(
     search: schemas.HotelSearchRequest,
-    request: Request,
-    db: Session = Depends(get_db)
+    request: Request
 ):
     """
     Search hotels and generate Hotellook affiliate link.
 
     Uses Travelpayouts/Hotellook for hotel bookings.
     """
-    # Log the search
-    crud.create_search_log(
-        db,
+    # Log the search (written in batches in the background)
+    await search_log_writer.submit(crud.search_log_record(
         search_type="hotel",
         origin=None,
         destination=search.destination,
@@ -346,7 +380,7 @@ async def search_hotels(
         ip_address=request.client.host if request.client else None,
         user_agent=request.headers.get("user-agent"),
         session_id=request.cookies.get("session_id")
-    )
+    ))
 
     # Generate Hotellook affiliate search URL
     params = {
@@ -373,7 +407,7 @@ async def search_hotels(
     )
 
 
-@router.get("/hotels/prices")
+@router.get("/hotels/prices", dependencies=[search_budget])
 async def get_hotel_prices(
     location: str = Query(..., description="City name (e.g., Barcelona, Paris)"),
     check_in: date = Query(..., description="Check-in date"),
@@ -392,47 +426,74 @@ async def get_hotel_prices(
     if not TRAVELPAYOUTS_TOKEN:
         raise HTTPException(status_code=500, detail="Travelpayouts API not configured")
 
-    params = {
-        "location": location,
-        "checkIn": str(check_in),
-        "checkOut": str(check_out),
-        "adults": adults,
-        "currency": currency,
-        "limit": limit,
-        "token": TRAVELPAYOUTS_TOKEN,
-    }
-
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{HOTEL_API}/cache.json",
-                params=params,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            hotels = response.json()
-
-            # Add affiliate booking links
-            for hotel in hotels:
-                hotel["booking_link"] = _generate_hotel_link(
-                    hotel.get("locationId", location),
-                    check_in, check_out, adults
-                )
-
-            return {
-                "success": True,
-                "hotels": hotels,
-                "count": len(hotels),
-                "location": location,
-                "check_in": str(check_in),
-                "check_out": str(check_out)
-            }
+        hotels = await _fetch_hotel_prices(location, check_in, check_out, adults, currency, limit)
+
+        return {
+            "success": True,
+            "hotels": hotels,
+            "count": len(hotels),
+            "location": location,
+            "check_in": str(check_in),
+            "check_out": str(check_out)
+        }
 
+    except DeadlineExceeded:
+        raise  # Handled app-wide as 504
     except httpx.HTTPError as e:
         raise HTTPException(status_code=502, detail=f"Hotel API error: {str(e)}")
 
 
-@router.get("/hotels/lookup")
+@router.get("/trip/stream", dependencies=[search_budget])
+async def stream_trip_search(
+    origin: str = Query(..., min_length=3, max_length=3, description="Origin IATA code"),
+    destination: str = Query(..., min_length=3, max_length=3, description="Destination IATA code"),
+    check_in: date = Query(..., description="Departure / check-in date"),
+    check_out: date = Query(..., description="Return / check-out date"),
+    adults: int = Query(2, ge=1, le=6),
+    currency: str = Query("EUR"),
+    limit: int = Query(20, ge=1, le=100),
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="ndjson or sse"),
+):
+    """
+    Search flights (Aviasales) and hotels (Hotellook) for a trip at once.
+
+    Each provider's results are streamed as a `result` event as soon as
+    they arrive, followed by a `summary` event.
+
+    Example: /search/trip/stream?origin=LON&destination=BCN&check_in=2025-06-01&check_out=2025-06-05
+    """
+    if not TRAVELPAYOUTS_TOKEN:
+        raise HTTPException(status_code=500, detail="Travelpayouts API not configured")
+
+    async def flights() -> Dict[str, Any]:
+        result = {"provider": "aviasales", "origin": origin.upper(), "destination": destination.upper()}
+        try:
+            data = await _fetch_flight_prices(
+                origin, destination, check_in.strftime("%Y-%m"), check_out.strftime("%Y-%m"), currency
+            )
+            result.update(success=True, data=data.get("data", {}))
+        except DeadlineExceeded:
+            result.update(success=False, error="Request deadline exceeded", timed_out=True)
+        except httpx.HTTPError as e:
+            result.update(success=False, error=f"Travelpayouts API error: {e}")
+        return result
+
+    async def hotels() -> Dict[str, Any]:
+        result = {"provider": "hotellook", "location": destination.upper()}
+        try:
+            found = await _fetch_hotel_prices(destination.upper(), check_in, check_out, adults, currency, limit)
+            result.update(success=True, hotels=found, count=len(found))
+        except DeadlineExceeded:
+            result.update(success=False, error="Request deadline exceeded", timed_out=True)
+        except httpx.HTTPError as e:
+            result.update(success=False, error=f"Hotel API error: {e}")
+        return result
+
+    return stream_results([flights(), hotels()], fmt=format)
+
+
+@router.get("/hotels/lookup", dependencies=[autocomplete_budget])
 async def lookup_hotels(
     query: str = Query(..., min_length=2, description="Search query"),
     lang: str = Query("en", description="Language code"),
@@ -456,15 +517,10 @@ async def lookup_hotels(
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{HOTEL_API}/lookup.json",
-                params=params,
-                timeout=15.0
-            )
-            response.raise_for_status()
-            return response.json()
+        return await get_json(f"{HOTEL_API}/lookup.json", params=params)
 
+    except DeadlineExceeded:
+        raise  # Handled app-wide as 504
     except httpx.HTTPError as e:
         raise HTTPException(status_code=502, detail=f"Lookup API error: {str(e)}")
 
@@ -474,24 +530,23 @@ async def lookup_hotels(
 # =============================================================================
 
 @router.get("/experiences", response_model=schemas.SearchResponse)
-def search_experiences(
+async def search_experiences(
     destination: str = Query(..., min_length=2),
     date: Optional[date] = None,
     category: Optional[str] = None,
-    request: Request = None,
-    db: Session = Depends(get_db)
+    request: Request = None
 ):
     """
     Generate GetYourGuide affiliate link for experiences/tours.
     """
     if request:
-        crud.create_search_log(
-            db, search_type="experience", origin=None, destination=destination,
+        await search_log_writer.submit(crud.search_log_record(
+            search_type="experience", origin=None, destination=destination,
             check_in=date, check_out=None, travelers=1,
             ip_address=request.client.host if request.client else None,
             user_agent=request.headers.get("user-agent"),
             session_id=request.cookies.get("session_id")
-        )
+        ))
 
     base_url = "https://www.getyourguide.com/s/"
     params = {"q": destination}
@@ -595,6 +650,113 @@ def get_widget_config():
 # HELPER FUNCTIONS
 # =============================================================================
 
+async def _fetch_flight_prices(
+    origin: str,
+    destination: str,
+    depart_date: Optional[str] = None,
+    return_date: Optional[str] = None,
+    currency: str = "EUR",
+    direct: bool = False
+) -> Dict[str, Any]:
+    """
+    Fetch cheapest (or direct) prices for one route and add booking links.
+
+    Raises httpx.HTTPStatusError / httpx.RequestError on upstream failure.
+    """
+    endpoint = f"{FLIGHT_API_V1}/prices/direct" if direct else f"{FLIGHT_API_V1}/prices/cheap"
+
+    params = {
+        "origin": origin.upper(),
+        "destination": destination.upper(),
+        "currency": currency,
+        "token": TRAVELPAYOUTS_TOKEN,
+    }
+
+    if depart_date:
+        params["depart_date"] = depart_date
+    if return_date:
+        params["return_date"] = return_date
+
+    data = await get_json(endpoint, params=params, cache_ttl=settings.CACHE_TTL_PRICES)
+
+    # Add affiliate booking links to each result
+    if data.get("success") and data.get("data"):
+        enriched_data = {}
+        for dest_code, flights in data["data"].items():
+            enriched_data[dest_code] = {}
+            for key, flight in flights.items():
+                flight["booking_link"] = _generate_flight_link(
+                    origin,
+                    dest_code,
+                    flight.get("departure_at", ""),
+                    flight.get("return_at", "")
+                )
+                enriched_data[dest_code][key] = flight
+        data["data"] = enriched_data
+
+    return data
+
+
+async def _flight_route_result(
+    origin: str,
+    destination: str,
+    batch: schemas.FlightPriceBatchRequest,
+    semaphore: asyncio.Semaphore
+) -> Dict[str, Any]:
+    """Prices for one route of a batch, with upstream errors reported inline."""
+    result = {"origin": origin.upper(), "destination": destination.upper()}
+    try:
+        async with semaphore:
+            data = await _fetch_flight_prices(
+                origin, destination, batch.depart_date, batch.return_date,
+                batch.currency, batch.direct
+            )
+        result.update(success=True, data=data.get("data", {}))
+    except DeadlineExceeded:
+        result.update(success=False, status_code=504, error="Request deadline exceeded", timed_out=True)
+    except httpx.HTTPStatusError as e:
+        result.update(success=False, status_code=e.response.status_code, error=f"Travelpayouts API error: {e}")
+    except httpx.RequestError as e:
+        result.update(success=False, status_code=502, error=f"Failed to connect to Travelpayouts: {e}")
+    return result
+
+
+async def _fetch_hotel_prices(
+    location: str,
+    check_in: date,
+    check_out: date,
+    adults: int = 2,
+    currency: str = "EUR",
+    limit: int = 20
+) -> List[Dict[str, Any]]:
+    """
+    Fetch Hotellook cached prices for a location and add booking links.
+
+    Raises httpx.HTTPStatusError / httpx.RequestError on upstream failure.
+    """
+    params = {
+        "location": location,
+        "checkIn": str(check_in),
+        "checkOut": str(check_out),
+        "adults": adults,
+        "currency": currency,
+        "limit": limit,
+        "token": TRAVELPAYOUTS_TOKEN,
+    }
+
+    hotels = await get_json(f"{HOTEL_API}/cache.json", params=params, cache_ttl=settings.CACHE_TTL_HOTELS)
+
+    # Add affiliate booking links
+    with timing.span(timing.LINKS):
+        for hotel in hotels:
+            hotel["booking_link"] = _generate_hotel_link(
+                hotel.get("locationId", location),
+                check_in, check_out, adults
+            )
+
+    return hotels
+
+
 def _generate_flight_link(origin: str, destination: str, departure_at: str, return_at: str = None) -> str:
     """Generate affiliate flight booking link."""
     try:
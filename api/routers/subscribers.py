@@ -1,14 +1,16 @@
 """
 Subscriber/Newsletter API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from ..database import get_db
+from ..timing import TimedRoute
+from ..pagination import decode_cursor, set_next_cursor
 from .. import crud, schemas
 
-router = APIRouter(prefix="/subscribers", tags=["Subscribers"])
+router = APIRouter(prefix="/subscribers", tags=["Subscribers"], route_class=TimedRoute)
 
 
 @router.post("/", response_model=schemas.SubscriberResponse, status_code=status.HTTP_201_CREATED)
@@ -41,15 +43,23 @@ def subscribe(subscriber: schemas.SubscriberCreate, db: Session = Depends(get_db
 
 @router.get("/", response_model=List[schemas.SubscriberResponse])
 def list_subscribers(
+        response: Response,
         skip: int = 0,
         limit: int = 100,
         active_only: bool = True,
+        cursor: Optional[str] = None,
         db: Session = Depends(get_db)
 ):
     """
     List all subscribers (admin endpoint).
+
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one.
     """
-    return crud.get_subscribers(db, skip=skip, limit=limit, active_only=active_only)
+    subscribers = crud.get_subscribers(
+        db, skip=skip, limit=limit, active_only=active_only, after_id=decode_cursor(cursor)
+    )
+    set_next_cursor(response, subscribers, limit)
+    return subscribers
 
 
 @router.get("/{email}", response_model=schemas.SubscriberResponse)
@@ -1,7 +1,7 @@
 """
 Pydantic schemas for request/response validation
 """
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, constr, model_validator
 from typing import Optional, List
 from datetime import datetime, date
 
@@ -183,6 +183,38 @@ class HotelSearchRequest(BaseModel):
     rooms: Optional[int] = Field(1, ge=1, le=5)
 
 
+class FlightRoute(BaseModel):
+    origin: str = Field(..., min_length=3, max_length=3)
+    destination: str = Field(..., min_length=3, max_length=3)
+
+
+class FlightPriceBatchRequest(BaseModel):
+    origin: Optional[str] = Field(None, min_length=3, max_length=3)
+    destinations: Optional[List[constr(min_length=3, max_length=3)]] = Field(None, max_length=50)
+    routes: Optional[List[FlightRoute]] = Field(None, max_length=50)
+    depart_date: Optional[str] = None  # YYYY-MM
+    return_date: Optional[str] = None  # YYYY-MM
+    currency: str = "EUR"
+    direct: bool = False
+
+    @model_validator(mode="after")
+    def check_routes(self):
+        if not self.routes and not (self.origin and self.destinations):
+            raise ValueError("Provide either origin + destinations or routes")
+        if len(self.route_pairs()) > 50:
+            raise ValueError("At most 50 routes per batch")
+        return self
+
+    def route_pairs(self) -> List[tuple]:
+        """All (origin, destination) pairs in the batch, duplicates removed."""
+        pairs = []
+        if self.origin and self.destinations:
+            pairs.extend((self.origin.upper(), d.upper()) for d in self.destinations)
+        if self.routes:
+            pairs.extend((r.origin.upper(), r.destination.upper()) for r in self.routes)
+        return list(dict.fromkeys(pairs))
+
+
 class SearchResponse(BaseModel):
     search_url: str
     affiliate_provider: str
@@ -231,6 +263,21 @@ class AnalyticsResponse(BaseModel):
     recent_signups: int
 
 
+class TimeSeries(BaseModel):
+    name: Optional[str]  # Dimension value; None for the overall series
+    total: int
+    points: List[int]  # One count per bucket in TimeSeriesResponse.buckets
+
+
+class TimeSeriesResponse(BaseModel):
+    metric: str
+    bucket: str
+    group_by: Optional[str]
+    buckets: List[datetime]  # Bucket start times (UTC)
+    series: List[TimeSeries]
+    total: int
+
+
 # ============== Generic Response Schemas ==============
 
 class MessageResponse(BaseModel):
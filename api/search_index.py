@@ -0,0 +1,134 @@
+"""
+Full-text destination search
+
+/destinations/search backs the frontend autocomplete, and ILIKE '%q%' over
+name, country and city_code cannot use an index. Destinations are indexed
+for full-text search instead:
+
+- SQLite: an FTS5 table over the destinations table, kept in sync by
+  triggers, with prefix indexes for 2 and 3 characters
+- Postgres: a GIN expression index on to_tsvector(...)
+
+Each query word is matched as a prefix ("bar" finds Barcelona). Results are
+ranked by relevance (name > city code > country), with featured
+destinations boosted. When neither is available, crud falls back to ILIKE.
+"""
+import re
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from .logger import log_info, log_warning
+from . import models
+
+FTS_TABLE = "destinations_fts"
+
+# Featured destinations score this much better
+FEATURED_BOOST = 1.5
+
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, country, city_code,
+        content='destinations', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON destinations BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, country, city_code)
+        VALUES (new.id, new.name, new.country, new.city_code);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON destinations BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, country, city_code)
+        VALUES ('delete', old.id, old.name, old.country, old.city_code);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, country, city_code
+    ON destinations BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, country, city_code)
+        VALUES ('delete', old.id, old.name, old.country, old.city_code);
+        INSERT INTO {FTS_TABLE}(rowid, name, country, city_code)
+        VALUES (new.id, new.name, new.country, new.city_code);
+    END""",
+]
+
+_SQLITE_SEARCH = f"""
+    SELECT destinations.* FROM {FTS_TABLE}
+    JOIN destinations ON destinations.id = {FTS_TABLE}.rowid
+    WHERE {FTS_TABLE} MATCH :match
+    ORDER BY bm25({FTS_TABLE}, 10.0, 2.0, 5.0)
+        * CASE WHEN destinations.is_featured THEN {FEATURED_BOOST} ELSE 1.0 END
+    LIMIT :limit
+"""
+
+_PG_DOCUMENT = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(country, '') "
+    "|| ' ' || coalesce(city_code, ''))"
+)
+
+_PG_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_destinations_search ON destinations USING GIN ({_PG_DOCUMENT})",
+]
+
+_PG_SEARCH = f"""
+    SELECT destinations.* FROM destinations
+    WHERE {_PG_DOCUMENT} @@ to_tsquery('simple', :match)
+    ORDER BY ts_rank({_PG_DOCUMENT}, to_tsquery('simple', :match))
+        * CASE WHEN is_featured THEN {FEATURED_BOOST} ELSE 1.0 END DESC
+    LIMIT :limit
+"""
+
+# Dialect whose full-text index is ready, set by setup()
+_backend: Optional[str] = None
+
+
+def setup(engine: Engine) -> bool:
+    """Create the full-text index if needed (called from main.lifespan)."""
+    global _backend
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as conn:
+            if dialect == "sqlite":
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": FTS_TABLE}
+                ).first()
+                for statement in _SQLITE_DDL:
+                    conn.execute(text(statement))
+                if not exists:
+                    # Index destinations that existed before the FTS table
+                    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+                    log_info("Built destination full-text index")
+            elif dialect == "postgresql":
+                for statement in _PG_DDL:
+                    conn.execute(text(statement))
+            else:
+                return False
+    except OperationalError as e:
+        # e.g. SQLite compiled without FTS5
+        log_warning(f"Destination full-text search unavailable, using ILIKE: {e}")
+        return False
+    _backend = dialect
+    return True
+
+
+def _match_expression(query: str) -> Optional[str]:
+    """Each word of the query as a prefix term, all required."""
+    words = re.findall(r"\w+", query.lower())
+    if not words:
+        return None
+    if _backend == "postgresql":
+        return " & ".join(f"{word}:*" for word in words)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_destinations(db: Session, query: str, limit: int) -> Optional[List[models.Destination]]:
+    """Ranked full-text matches, or None when no full-text index is set up."""
+    if _backend is None:
+        return None
+    match = _match_expression(query)
+    if match is None:
+        return []
+    statement = text(_PG_SEARCH if _backend == "postgresql" else _SQLITE_SEARCH)
+    return db.query(models.Destination).from_statement(
+        statement.bindparams(match=match, limit=limit)
+    ).all()
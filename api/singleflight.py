@@ -0,0 +1,58 @@
+"""
+Single-flight coalescing of identical in-flight upstream requests
+
+When a route trends, many concurrent requests ask the upstream for exactly
+the same thing. SingleFlight lets the first caller start the work and makes
+every concurrent caller with the same key await that one result (or error)
+instead of issuing its own request.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Share one in-flight awaitable between callers with the same key.
+
+    The work runs in its own task, so a caller that is cancelled (e.g. the
+    client disconnected) does not cancel the request for everyone else.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, "asyncio.Task"] = {}
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() once per key at a time and return its result to every caller."""
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._finish(k, t))
+        else:
+            self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: "asyncio.Task") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the error as retrieved if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """Counts of calls, upstream executions and collapsed duplicates."""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._inflight),
+        }
+
+
+# Shared coalescer for upstream GETs (one per worker)
+upstream_flights = SingleFlight()
@@ -0,0 +1,78 @@
+"""
+Streaming responses for fan-out searches
+
+Multi-route and multi-provider searches are only as fast as their slowest
+upstream call. These helpers emit each partial result as soon as it is
+ready, either as NDJSON lines or as Server-Sent Events, followed by a
+final summary event.
+"""
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Dict, List, AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def encode_event(event: Dict[str, Any], fmt: str = "ndjson") -> str:
+    """Encode one event as an NDJSON line or an SSE message."""
+    payload = json.dumps(event, default=str)
+    if fmt == "sse":
+        return f"event: {event.get('type', 'message')}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+async def _as_completed(jobs: List[Awaitable[Dict[str, Any]]]) -> AsyncIterator[Dict[str, Any]]:
+    """Yield job results in completion order, then a summary event."""
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future(job) for job in jobs]
+    failed = 0
+    partial = False
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            if not result.get("success", True):
+                failed += 1
+            if result.get("timed_out"):
+                partial = True
+            yield {"type": "result", **result}
+    finally:
+        # Client went away: stop the remaining upstream calls
+        for task in tasks:
+            task.cancel()
+
+    yield {
+        "type": "summary",
+        "count": len(tasks),
+        "failed": failed,
+        "partial": partial,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def stream_results(jobs: List[Awaitable[Dict[str, Any]]], fmt: str = "ndjson") -> StreamingResponse:
+    """
+    Stream the results of concurrent jobs as they complete.
+
+    Each job must return a dict; a falsy "success" key counts as a failure
+    in the summary and a truthy "timed_out" key (the request deadline hit
+    first) marks the summary as partial. Jobs should handle their own
+    upstream errors.
+    """
+    async def body():
+        async for event in _as_completed(jobs):
+            yield encode_event(event, fmt)
+
+    return StreamingResponse(
+        body(),
+        media_type=_MEDIA_TYPES[fmt],
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Disable proxy buffering (nginx)
+        },
+    )
@@ -0,0 +1,174 @@
+"""
+Request-scoped Server-Timing spans
+
+Each request gets a Spans object in a context variable (set by
+main.add_process_time_header), so code running for the request, including
+sync endpoints in the threadpool and database events, can add time to it:
+
+- db: SQL statements (engine events, database.py)
+- upstream: upstream API calls (http_client._fetch)
+- app: the endpoint function itself, including its db/upstream time
+- validate: request parsing and validation, dependencies, and response
+  model validation and serialization (TimedRoute)
+- render: JSON encoding of the response body (TimedJSONResponse)
+- anything an endpoint wraps in span(), e.g. links for the affiliate link
+  generation in the hotel search
+
+The totals are returned in a Server-Timing header and, for requests slower
+than SLOW_REQUEST_MS, written to the slow-request log.
+"""
+import asyncio
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+DB = "db"
+UPSTREAM = "upstream"
+APP = "app"
+VALIDATE = "validate"
+RENDER = "render"
+LINKS = "links"
+TOTAL = "total"
+
+SERVER_TIMING_HEADER = "Server-Timing"
+
+_DESCRIPTIONS = {
+    DB: "Database",
+    UPSTREAM: "Upstream APIs",
+    APP: "Endpoint",
+    VALIDATE: "Validation and serialization",
+    RENDER: "JSON rendering",
+    LINKS: "Affiliate links",
+    TOTAL: "Total",
+}
+
+
+class Spans:
+    """Accumulated seconds and call counts per span name for one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals: Dict[str, List[float]] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        entry = self.totals.get(name)
+        if entry is None:
+            self.totals[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def seconds(self, name: str) -> float:
+        entry = self.totals.get(name)
+        return entry[0] if entry else 0.0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def header(self) -> str:
+        """Server-Timing header value, durations in milliseconds."""
+        parts = []
+        for name, (seconds, calls) in self.totals.items():
+            desc = _DESCRIPTIONS.get(name, name)
+            if name in (DB, UPSTREAM):
+                desc = f"{desc} ({int(calls)})"
+            parts.append(f'{name};dur={seconds * 1000:.1f};desc="{desc}"')
+        parts.append(f'{TOTAL};dur={self.elapsed() * 1000:.1f};desc="{_DESCRIPTIONS[TOTAL]}"')
+        return ", ".join(parts)
+
+    def summary(self) -> str:
+        """Compact breakdown for the slow-request log."""
+        return " ".join(
+            f"{name}={seconds * 1000:.1f}ms/{int(calls)}"
+            for name, (seconds, calls) in self.totals.items()
+        )
+
+
+_spans: ContextVar[Optional[Spans]] = ContextVar("request_spans", default=None)
+
+
+def start() -> Spans:
+    """Start collecting spans for the current request."""
+    spans = Spans()
+    _spans.set(spans)
+    return spans
+
+
+def record(name: str, seconds: float) -> None:
+    """Add time to a span of the current request (no-op outside requests)."""
+    spans = _spans.get()
+    if spans is not None:
+        spans.add(name, seconds)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a block as a span of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+# ============== Route and response classes ==============
+
+def _timed(call: Callable) -> Callable:
+    """Wrap an endpoint function to record its run time as the app span."""
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def timed_async(**kwargs) -> Any:
+            started = time.perf_counter()
+            try:
+                return await call(**kwargs)
+            finally:
+                record(APP, time.perf_counter() - started)
+        return timed_async
+
+    @functools.wraps(call)
+    def timed_sync(**kwargs) -> Any:
+        started = time.perf_counter()
+        try:
+            return call(**kwargs)
+        finally:
+            record(APP, time.perf_counter() - started)
+    return timed_sync
+
+
+class TimedRoute(APIRoute):
+    """
+    APIRoute that splits handler time into the endpoint (app) and everything
+    FastAPI does around it (validate), minus JSON rendering.
+    """
+
+    def get_route_handler(self) -> Callable:
+        self.dependant.call = _timed(self.dependant.call)
+        handler = super().get_route_handler()
+
+        async def timed_handler(request) -> Any:
+            started = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                spans = _spans.get()
+                if spans is not None:
+                    overhead = time.perf_counter() - started - spans.seconds(APP) - spans.seconds(RENDER)
+                    spans.add(VALIDATE, max(overhead, 0.0))
+
+        return timed_handler
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse recording the time spent encoding the body."""
+
+    def render(self, content: Any) -> bytes:
+        started = time.perf_counter()
+        try:
+            return super().render(content)
+        finally:
+            record(RENDER, time.perf_counter() - started)
@@ -9,7 +9,6 @@ Handles all integrations with Travelpayouts affiliate network:
 API Documentation: https://support.travelpayouts.com/hc/en-us/categories/200358578-API
 """
 
-import httpx
 from typing import Optional, List, Dict, Any
 from datetime import date, datetime
 from urllib.parse import urlencode
@@ -17,6 +16,7 @@ import hashlib
 import json
 
 from .config import get_settings
+from .http_client import get_json
 
 settings = get_settings()
 
@@ -80,14 +80,11 @@ class TravelpayoutsClient:
         if return_date:
             params["return_date"] = return_date.strftime("%Y-%m")
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.FLIGHT_API_BASE}/prices/cheap",
-                params=params,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        return await get_json(
+            f"{self.FLIGHT_API_BASE}/prices/cheap",
+            params=params,
+            cache_ttl=settings.CACHE_TTL_PRICES
+        )
 
     async def get_direct_flights(
         self,
@@ -115,14 +112,11 @@ class TravelpayoutsClient:
         if return_date:
             params["return_date"] = return_date.strftime("%Y-%m")
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.FLIGHT_API_BASE}/prices/direct",
-                params=params,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        return await get_json(
+            f"{self.FLIGHT_API_BASE}/prices/direct",
+            params=params,
+            cache_ttl=settings.CACHE_TTL_PRICES
+        )
 
     async def get_flight_prices_calendar(
         self,
@@ -144,14 +138,11 @@ class TravelpayoutsClient:
             "token": self.token,
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.FLIGHT_API_BASE}/prices/calendar",
-                params=params,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        return await get_json(
+            f"{self.FLIGHT_API_BASE}/prices/calendar",
+            params=params,
+            cache_ttl=settings.CACHE_TTL_CALENDAR
+        )
 
     async def get_popular_destinations(
         self,
@@ -169,14 +160,11 @@ class TravelpayoutsClient:
             "token": self.token,
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.FLIGHT_API_BASE}/city-directions",
-                params=params,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        return await get_json(
+            f"{self.FLIGHT_API_BASE}/city-directions",
+            params=params,
+            cache_ttl=settings.CACHE_TTL_POPULAR
+        )
 
     async def get_airline_directions(
         self,
@@ -194,14 +182,7 @@ class TravelpayoutsClient:
             "token": self.token,
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.FLIGHT_API_BASE}/airline-directions",
-                params=params,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        return await get_json(f"{self.FLIGHT_API_BASE}/airline-directions", params=params)
 
     async def search_flights_v3(
         self,
@@ -235,14 +216,11 @@ class TravelpayoutsClient:
         if return_at:
             params["return_at"] = return_at.strftime("%Y-%m-%d")
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.AVIASALES_API}/prices_for_dates",
-                params=params,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        return await get_json(
+            f"{self.AVIASALES_API}/prices_for_dates",
+            params=params,
+            cache_ttl=settings.CACHE_TTL_LATEST
+        )
 
     # ==========================================================================
     # HOTEL APIs
@@ -276,14 +254,11 @@ class TravelpayoutsClient:
             "token": self.token,
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.HOTEL_API_BASE}/cache.json",
-                params=params,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        return await get_json(
+            f"{self.HOTEL_API_BASE}/cache.json",
+            params=params,
+            cache_ttl=settings.CACHE_TTL_HOTELS
+        )
 
     async def get_hotel_lookup(
         self,
@@ -303,14 +278,7 @@ class TravelpayoutsClient:
             "token": self.token,
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.HOTEL_API_BASE}/lookup.json",
-                params=params,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        return await get_json(f"{self.HOTEL_API_BASE}/lookup.json", params=params)
 
     async def get_hotel_prices(
         self,
@@ -334,14 +302,11 @@ class TravelpayoutsClient:
             "token": self.token,
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.HOTEL_API_BASE}/cache.json",
-                params=params,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        return await get_json(
+            f"{self.HOTEL_API_BASE}/cache.json",
+            params=params,
+            cache_ttl=settings.CACHE_TTL_HOTELS
+        )
 
     # ==========================================================================
     # AFFILIATE LINK GENERATION
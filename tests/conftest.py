@@ -0,0 +1,39 @@
+"""
+Test configuration
+
+Settings are read once at import time, so the environment is pointed at a
+throwaway SQLite database (and working directory, for the log files)
+before anything from api is imported.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_workdir = tempfile.mkdtemp(prefix="tripcompare-tests-")
+os.chdir(_workdir)
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(_workdir, 'test.db')}",
+    FARE_STORE_PATH="",
+    METRICS_DIR="",
+    TRAVELPAYOUTS_TOKEN="",
+)
+
+import pytest  # noqa: E402
+
+from api import models  # noqa: E402,F401  (registers the tables)
+from api.database import SessionLocal, init_db  # noqa: E402
+
+init_db()
+
+
+@pytest.fixture
+def db():
+    """A database session, closed after the test."""
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
@@ -0,0 +1,39 @@
+"""
+Request deadlines reaching SQLite statements
+"""
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from api import deadline
+from api.database import AsyncSessionLocal
+
+# Counts to 50 million: runs for seconds unless it is interrupted
+SLOW_QUERY = text(
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 50000000) "
+    "SELECT count(*) FROM n"
+)
+
+
+def test_async_engine_statements_stop_at_the_deadline():
+    async def run_slow_query():
+        deadline.start(0.05)
+        async with AsyncSessionLocal() as db:
+            await db.execute(SLOW_QUERY)
+
+    started = time.monotonic()
+    with pytest.raises(OperationalError, match="interrupted"):
+        asyncio.run(run_slow_query())
+    assert time.monotonic() - started < 2
+
+
+def test_async_engine_statements_without_deadline_are_not_interrupted():
+    async def run_query():
+        async with AsyncSessionLocal() as db:
+            # The previous statement on this pooled connection had an expired deadline
+            return (await db.execute(text("SELECT 1"))).scalar()
+
+    assert asyncio.run(run_query()) == 1
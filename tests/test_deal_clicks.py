@@ -0,0 +1,72 @@
+"""
+Concurrent deal clicks
+
+POST /deals/{id}/click and GET /deals/{id}/redirect hand clicks to the
+batch writer, which inserts the click_tracking rows and adds to
+deals.click_count in batches. Under concurrent load no click may be lost
+or counted twice.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from api import crud, models
+from api.main import app
+
+CLICKS_PER_DEAL = 150
+THREADS = 16
+
+
+def _create_deal(db, name: str) -> int:
+    deal = models.Deal(
+        title=f"Stress test deal {name}",
+        deal_type="flight",
+        original_price=100.0,
+        deal_price=80.0,
+        affiliate_link=f"https://example.com/deals/{name}",
+        affiliate_provider="aviasales",
+        click_count=0,
+    )
+    db.add(deal)
+    db.commit()
+    return deal.id
+
+
+def _clicks_for(db, deal_id: int) -> int:
+    return db.scalar(
+        select(func.count()).select_from(models.ClickTracking)
+        .where(models.ClickTracking.deal_id == deal_id)
+    )
+
+
+def test_concurrent_clicks_and_redirects_are_all_counted(db):
+    deal_ids = [_create_deal(db, f"preloaded-{i}") for i in range(3)]
+    missing_id = max(deal_ids) + 1000
+
+    with TestClient(app) as client:
+        # Not in the link map loaded at startup: resolved from the database
+        deal_ids.append(_create_deal(db, "late"))
+
+        calls = [
+            ("POST", f"/deals/{deal_id}/click") if i % 2 else ("GET", f"/deals/{deal_id}/redirect")
+            for i in range(CLICKS_PER_DEAL)
+            for deal_id in deal_ids
+        ]
+        calls += [("POST", f"/deals/{missing_id}/click"), ("GET", f"/deals/{missing_id}/redirect")] * 10
+
+        with ThreadPoolExecutor(THREADS) as pool:
+            statuses = list(pool.map(lambda call: client.request(*call).status_code, calls))
+    # Leaving the client ran the lifespan shutdown, which flushes the writers
+
+    assert statuses.count(200) == CLICKS_PER_DEAL * len(deal_ids)
+    assert statuses.count(404) == 20
+
+    db.expire_all()
+    for deal_id in deal_ids:
+        assert db.get(models.Deal, deal_id).click_count == CLICKS_PER_DEAL
+        assert _clicks_for(db, deal_id) == CLICKS_PER_DEAL
+    assert _clicks_for(db, missing_id) == 0
+
+    total_rows = db.scalar(select(func.count()).select_from(models.ClickTracking))
+    assert crud.count_clicks(db) == total_rows
@@ -0,0 +1,61 @@
+"""
+Keyset pagination cursors
+"""
+from fastapi.testclient import TestClient
+
+from api import models
+from api.main import app
+from api.pagination import NEXT_CURSOR_HEADER
+
+
+def _create_deals(db, count: int) -> None:
+    db.add_all(
+        models.Deal(title=f"Paged deal {i}", deal_type="hotel", original_price=200.0, deal_price=150.0)
+        for i in range(count)
+    )
+    db.commit()
+
+
+def test_cursor_to_deleted_row_is_rejected(db):
+    _create_deals(db, 5)
+    client = TestClient(app)
+
+    first = client.get("/deals/", params={"limit": 2})
+    assert first.status_code == 200
+    cursor = first.headers[NEXT_CURSOR_HEADER]
+    assert client.get("/deals/", params={"limit": 2, "cursor": cursor}).status_code == 200
+
+    anchor = db.get(models.Deal, first.json()[-1]["id"])
+    db.delete(anchor)
+    db.commit()
+
+    response = client.get("/deals/", params={"limit": 2, "cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_cursor_pages_cover_null_ratings_exactly_once(db):
+    ratings = [4.9, 4.5, None, 4.5, None, 3.0, None, None, 4.0]
+    db.add_all(
+        models.Experience(title=f"Rated {i}", price=50.0, rating=rating, category="null-paging")
+        for i, rating in enumerate(ratings)
+    )
+    db.commit()
+    client = TestClient(app)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, "category": "null-paging"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/experiences/", params=params)
+        assert response.status_code == 200
+        seen += response.json()
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+
+    assert len(seen) == len(ratings)
+    assert len({e["id"] for e in seen}) == len(ratings)
+    rated = [e["rating"] for e in seen if e["rating"] is not None]
+    assert rated == sorted(rated, reverse=True)
+    assert all(e["rating"] is None for e in seen[len(rated):])  # Unrated last
@@ -0,0 +1,150 @@
+"""
+Query plan regression tests
+
+The composite indexes in models.py exist for specific access paths. These
+tests capture the SQL that the crud and rollup functions actually emit,
+run EXPLAIN QUERY PLAN on it, and check that SQLite searches the intended
+index instead of scanning the table, so a change to a query (or an index)
+that loses the index fails here rather than in production.
+
+The planner is given the statistics ANALYZE records for a production-sized
+database (about 1M rows per table) through sqlite_stat1, since its choices
+on empty, never-analyzed tables can differ from those at scale.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, List, Tuple
+
+import pytest
+from sqlalchemy import event, text
+
+from api import crud, rollups
+from api.database import engine
+
+# Partial hours at both ends, so both raw-table ranges are queried
+SINCE = datetime(2024, 1, 1, 10, 30)
+UNTIL = datetime(2024, 1, 3, 12, 15)
+
+# sqlite_stat1 "rows avg-rows-per-key-prefix..." per index at 1M rows:
+# 90% of deals and experiences active, 500 destinations, 4 deal types,
+# 5% featured, 8 experience categories, ratings in 0.1 steps, nearly
+# unique timestamps, 6 affiliate providers.
+STATS_1M = {
+    "deals": {
+        None: "1000000",
+        "ix_deals_id": "1000000 1",
+        "ix_deals_active_created": "1000000 500000 1",
+        "ix_deals_active_type_created": "1000000 500000 125000 1",
+        "ix_deals_active_featured_created": "1000000 500000 250000 1",
+        "ix_deals_destination_active": "1000000 2000 1000",
+    },
+    "experiences": {
+        None: "1000000",
+        "ix_experiences_id": "1000000 1",
+        "ix_experiences_active_rating": "1000000 500000 10000",
+        "ix_experiences_active_destination_rating": "1000000 500000 1000 20",
+        "ix_experiences_active_category_rating": "1000000 500000 62500 1250",
+    },
+    "click_tracking": {
+        None: "1000000",
+        "ix_click_tracking_id": "1000000 1",
+        "ix_click_tracking_created_provider": "1000000 2 1",
+    },
+    "search_logs": {
+        None: "1000000",
+        "ix_search_logs_id": "1000000 1",
+        "ix_search_logs_created": "1000000 2",
+        "ix_search_logs_destination": "1000000 2000",
+    },
+}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def production_statistics():
+    """Install STATS_1M for the duration of this module."""
+    tables = tuple(STATS_1M)
+    placeholders = ", ".join(f":t{i}" for i in range(len(tables)))
+    names = {f"t{i}": table for i, table in enumerate(tables)}
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))  # Creates sqlite_stat1
+        conn.execute(text(f"DELETE FROM sqlite_stat1 WHERE tbl IN ({placeholders})"), names)
+        conn.execute(
+            text("INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (:tbl, :idx, :stat)"),
+            [
+                {"tbl": table, "idx": index, "stat": stat}
+                for table, indexes in STATS_1M.items()
+                for index, stat in indexes.items()
+            ],
+        )
+    yield
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM sqlite_stat1 WHERE tbl IN ({placeholders})"), names)
+
+
+@contextmanager
+def captured_selects(table: str) -> Iterator[List[Tuple[str, tuple]]]:
+    """Collect the (statement, parameters) of SELECTs reading `table`."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and f"FROM {table}" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def query_plans(db, call, table: str) -> List[str]:
+    """EXPLAIN QUERY PLAN for every SELECT on `table` issued by call(db)."""
+    with captured_selects(table) as statements:
+        call(db)
+    assert statements, f"no SELECT on {table} captured"
+    connection = db.connection()
+    connection.exec_driver_sql("ANALYZE sqlite_schema")  # Reload the statistics
+    return [
+        "\n".join(row[-1] for row in connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + statement, parameters
+        ))
+        for statement, parameters in statements
+    ]
+
+
+@pytest.mark.parametrize("table, call, index", [
+    ("deals", lambda db: crud.get_deals(db), "ix_deals_active_created"),
+    ("deals", lambda db: crud.get_deals(db, deal_type="flight"), "ix_deals_active_type_created"),
+    ("deals", lambda db: crud.get_deals(db, featured_only=True), "ix_deals_active_featured_created"),
+    ("deals", lambda db: crud.get_deals_by_destination(db, 1), "ix_deals_destination_active"),
+    ("experiences", lambda db: crud.get_experiences(db), "ix_experiences_active_rating"),
+    (
+        "experiences",
+        lambda db: crud.get_experiences(db, destination_id=1),
+        "ix_experiences_active_destination_rating",
+    ),
+    (
+        "experiences",
+        lambda db: crud.get_experiences(db, category="tour"),
+        "ix_experiences_active_category_rating",
+    ),
+    (
+        "click_tracking",
+        lambda db: rollups.count(db, rollups.CLICKS, SINCE, UNTIL),
+        "ix_click_tracking_created_provider",
+    ),
+    (
+        "click_tracking",
+        lambda db: rollups.count(db, rollups.CLICKS, SINCE, UNTIL, by="affiliate_provider"),
+        "ix_click_tracking_created_provider",
+    ),
+    (
+        "search_logs",
+        lambda db: rollups.count(db, rollups.SEARCHES, SINCE, UNTIL, by="destination"),
+        "ix_search_logs_created",
+    ),
+])
+def test_query_uses_index(db, table, call, index):
+    for plan in query_plans(db, call, table):
+        assert f"INDEX {index}" in plan, plan
+        assert f"SCAN {table}" not in plan, plan
@@ -0,0 +1,47 @@
+"""
+Rollup time handling
+
+Buckets are naive UTC internally. Aware inputs are converted to UTC, and
+on Postgres (timestamptz columns) every bound timestamp is aware UTC, so
+results do not depend on the server's session time zone.
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from api import models, rollups
+
+PLUS_3 = timezone(timedelta(hours=3))
+
+
+def test_aware_inputs_are_bucketed_in_utc():
+    assert rollups.bucket_start(datetime(2024, 1, 1, 1, 30, tzinfo=PLUS_3), rollups.DAY) == datetime(2023, 12, 31)
+    assert rollups.split_window(
+        datetime(2024, 1, 1, 13, 30, tzinfo=PLUS_3), datetime(2024, 1, 1, 12, 15)
+    ) == [
+        (None, datetime(2024, 1, 1, 10, 30), datetime(2024, 1, 1, 11)),
+        (rollups.HOUR, datetime(2024, 1, 1, 11), datetime(2024, 1, 1, 12)),
+        (None, datetime(2024, 1, 1, 12), datetime(2024, 1, 1, 12, 15)),
+    ]
+
+
+def test_postgres_binds_aware_utc_timestamps():
+    bound = rollups._raw_bound("postgresql", datetime(2024, 1, 1, 10, 30))
+    assert bound.type.timezone
+    assert bound.value == datetime(2024, 1, 1, 10, 30, tzinfo=timezone.utc)
+
+    stmt = rollups.increment_statement("postgresql", rollups.CLICKS, [
+        {"created_at": datetime(2024, 1, 1, 10, 30), "affiliate_provider": "aviasales", "link_type": "deal"}
+    ])
+    params = stmt.compile(dialect=postgresql.dialect()).params
+    starts = sorted(value for key, value in params.items() if key.startswith("bucket_start"))
+    assert starts == [
+        datetime(2024, 1, 1, tzinfo=timezone.utc),
+        datetime(2024, 1, 1, 10, tzinfo=timezone.utc),
+    ]
+
+
+def test_postgres_backfill_truncates_in_utc():
+    expression = rollups._bucket_expression("postgresql", models.ClickTracking.created_at, rollups.HOUR)
+    compiled = expression.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    assert str(compiled) == "timezone('UTC', date_trunc('hour', timezone('UTC', click_tracking.created_at)))"